@@ -0,0 +1,244 @@
+from collections import deque
+import asyncio
+import json
+import time
+
+
+RESYNC_MESSAGE = json.dumps({"type": "resync"}, separators=(",", ":"))
+PING_MESSAGE = json.dumps({"type": "ping"}, separators=(",", ":"))
+CLOSE_SLOW_CONSUMER = 1013
+CLOSE_SEND_FAILED = 1011
+CLOSE_UNRESPONSIVE = 4408
+
+
+class Connection:
+    def __init__(self, websocket, max_backlog: int):
+        self.websocket = websocket
+        self.queue = asyncio.Queue(maxsize=max_backlog)
+        self.task = None
+        self.connected_at = time.time()
+        self.last_seen = time.monotonic()
+        self.lagging = False
+        self.sent = 0
+        self.topics = set()
+        self.last_seq = 0
+
+
+class Broadcaster:
+    def __init__(
+        self,
+        max_backlog: int = 256,
+        send_timeout: float = 10.0,
+        replay_events: int = 1024,
+        latency_samples: int = 1024,
+    ):
+        self.max_backlog = max_backlog
+        self.send_timeout = send_timeout
+        self.epoch = None
+        self._history = deque(maxlen=replay_events)
+        self._connections = set()
+        self._topics = {}
+        self._latencies = deque(maxlen=latency_samples)
+        self._published = 0
+        self._delivered = 0
+        self._downgraded = 0
+        self._dropped = 0
+        self._send_errors = 0
+        self._latency_max = 0.0
+        self._recipients = 0
+        self._seq = 0
+        self._evicted_seq = 0
+        self._replayed = 0
+        self._resyncs = 0
+        self._reaped = 0
+        self._heartbeat = None
+
+    def start(self, epoch: str, seq: int):
+        self.epoch = epoch
+        self._seq = seq
+        self._evicted_seq = seq
+        self._history.clear()
+
+    def start_heartbeat(self, interval: float, timeout: float):
+        self._heartbeat = asyncio.get_running_loop().create_task(self._heartbeat_loop(interval, timeout))
+
+    def stop(self):
+        if self._heartbeat is not None:
+            self._heartbeat.cancel()
+            self._heartbeat = None
+
+    async def _heartbeat_loop(self, interval: float, timeout: float):
+        while True:
+            await asyncio.sleep(interval)
+            now = time.monotonic()
+            for connection in list(self._connections):
+                if now - connection.last_seen > timeout:
+                    self._reaped += 1
+                    self._drop(connection, CLOSE_UNRESPONSIVE)
+                else:
+                    self._enqueue(connection, PING_MESSAGE, time.perf_counter())
+
+    def touch(self, connection):
+        connection.last_seen = time.monotonic()
+
+    def connect(self, websocket):
+        connection = Connection(websocket, self.max_backlog)
+        connection.last_seq = self._seq
+        connection.task = asyncio.get_running_loop().create_task(self._send_loop(connection))
+        self._connections.add(connection)
+        return connection
+
+    def disconnect(self, connection):
+        self._connections.discard(connection)
+        self.unsubscribe(connection, list(connection.topics))
+        if connection.task is not None and connection.task is not asyncio.current_task():
+            connection.task.cancel()
+
+    def subscribe(self, connection, topics):
+        if connection not in self._connections:
+            return
+        connection.last_seq = self._seq
+        for topic in topics:
+            connection.topics.add(topic)
+            self._topics.setdefault(topic, set()).add(connection)
+
+    def unsubscribe(self, connection, topics):
+        for topic in topics:
+            connection.topics.discard(topic)
+            subscribers = self._topics.get(topic)
+            if subscribers is not None:
+                subscribers.discard(connection)
+                if not subscribers:
+                    del self._topics[topic]
+
+    def missed(self, connection, last_seq: int, epoch: str | None):
+        if epoch != self.epoch or last_seq > self._seq or last_seq < self._evicted_seq:
+            self._resyncs += 1
+            return None
+        return [
+            (seq, text)
+            for seq, topics, text in self._history
+            if seq > last_seq and not topics.isdisjoint(connection.topics)
+        ]
+
+    def replay(self, connection, last_seq: int, events):
+        enqueued_at = time.perf_counter()
+        connection.last_seq = last_seq
+        for seq, text in events:
+            if not self._enqueue(connection, f'{{"prev":{connection.last_seq},{text[1:]}', enqueued_at):
+                return
+            connection.last_seq = seq
+            self._replayed += 1
+
+    def send(self, connection, message: dict):
+        text = json.dumps(message, separators=(",", ":"), ensure_ascii=False)
+        return self._enqueue(connection, text, time.perf_counter())
+
+    def deliver(self, seq: int, topics: frozenset, text: str):
+        self._seq = seq
+        self._published += 1
+        if len(self._history) == self._history.maxlen:
+            self._evicted_seq = self._history[0][0]
+        self._history.append((seq, topics, text))
+        targets = set()
+        for topic in topics:
+            targets.update(self._topics.get(topic, ()))
+        if not targets:
+            return 0
+        enqueued_at = time.perf_counter()
+        recipients = 0
+        for connection in targets:
+            if self._enqueue(connection, f'{{"prev":{connection.last_seq},{text[1:]}', enqueued_at):
+                recipients += 1
+            connection.last_seq = self._seq
+        self._recipients += recipients
+        return recipients
+
+    def _enqueue(self, connection, text: str, enqueued_at: float):
+        try:
+            connection.queue.put_nowait((text, enqueued_at))
+            return True
+        except asyncio.QueueFull:
+            pass
+        if connection.lagging:
+            self._dropped += 1
+            self._drop(connection, CLOSE_SLOW_CONSUMER)
+            return False
+        self._downgraded += 1
+        connection.lagging = True
+        while not connection.queue.empty():
+            connection.queue.get_nowait()
+        connection.queue.put_nowait((RESYNC_MESSAGE, enqueued_at))
+        return True
+
+    def _drop(self, connection, code: int):
+        self.disconnect(connection)
+        asyncio.get_running_loop().create_task(self._close(connection.websocket, code))
+
+    @staticmethod
+    async def _close(websocket, code: int):
+        try:
+            await websocket.close(code=code)
+        except Exception:
+            pass
+
+    async def _send_loop(self, connection):
+        try:
+            while True:
+                text, enqueued_at = await connection.queue.get()
+                await asyncio.wait_for(connection.websocket.send_text(text), self.send_timeout)
+                latency = time.perf_counter() - enqueued_at
+                self._latencies.append(latency)
+                self._latency_max = max(self._latency_max, latency)
+                self._delivered += 1
+                connection.sent += 1
+                if text is RESYNC_MESSAGE:
+                    connection.lagging = False
+        except asyncio.CancelledError:
+            raise
+        except Exception:
+            self._send_errors += 1
+            self.disconnect(connection)
+            await self._close(connection.websocket, CLOSE_SEND_FAILED)
+
+    def stats(self, detail_limit: int = 50):
+        latencies = sorted(self._latencies)
+        backlogs = [connection.queue.qsize() for connection in self._connections]
+        now = time.time()
+        monotonic_now = time.monotonic()
+        oldest = sorted(self._connections, key=lambda connection: connection.connected_at)
+        ages = [now - connection.connected_at for connection in oldest]
+        return {
+            "connections": len(self._connections),
+            "age_s_avg": sum(ages) / len(ages) if ages else 0.0,
+            "age_s_max": ages[0] if ages else 0.0,
+            "reaped": self._reaped,
+            "clients": [
+                {
+                    "age_s": now - connection.connected_at,
+                    "idle_s": monotonic_now - connection.last_seen,
+                    "topics": len(connection.topics),
+                    "backlog": connection.queue.qsize(),
+                    "sent": connection.sent,
+                }
+                for connection in oldest[:detail_limit]
+            ],
+            "seq": self._seq,
+            "epoch": self.epoch,
+            "replay_buffer": len(self._history),
+            "replay_oldest_seq": self._history[0][0] if self._history else None,
+            "replayed": self._replayed,
+            "resyncs": self._resyncs,
+            "topics": len(self._topics),
+            "recipients_avg": self._recipients / self._published if self._published else 0.0,
+            "max_backlog": self.max_backlog,
+            "published": self._published,
+            "delivered": self._delivered,
+            "downgraded": self._downgraded,
+            "dropped": self._dropped,
+            "send_errors": self._send_errors,
+            "backlog_max": max(backlogs, default=0),
+            "latency_ms_p50": latencies[len(latencies) // 2] * 1000 if latencies else 0.0,
+            "latency_ms_p95": latencies[int(len(latencies) * 0.95)] * 1000 if latencies else 0.0,
+            "latency_ms_max": self._latency_max * 1000,
+        }
@@ -0,0 +1,287 @@
+import json
+import logging
+import os
+import threading
+import time
+
+
+logger = logging.getLogger(__name__)
+
+
+def encode_event(seq: int, body: str):
+    return f'{{"seq":{seq},{body[1:]}'
+
+
+class LocalBus:
+    def __init__(self):
+        self.epoch = os.urandom(4).hex()
+        self._lock = threading.Lock()
+        self._seq = 0
+        self._on_event = None
+        self._clients = {}
+        self._round_robin = {}
+
+    def init(self, conn):
+        pass
+
+    def start(self, loop, on_event, on_control):
+        self._on_event = on_event
+        return self._seq
+
+    def stop(self):
+        pass
+
+    async def publish(self, message: dict, topics):
+        self._seq += 1
+        body = json.dumps(message, separators=(",", ":"), ensure_ascii=False)
+        self._on_event(self._seq, frozenset(topics), encode_event(self._seq, body))
+
+    async def publish_many(self, events):
+        for message, topics in events:
+            await self.publish(message, topics)
+
+    def notify(self, kind: str, payload):
+        pass
+
+    def touch_client(self, device_id: str, table_id: str, last_seen: str):
+        with self._lock:
+            self._clients[device_id] = {"device_id": device_id, "table_id": table_id, "last_seen": last_seen}
+
+    def clients(self):
+        with self._lock:
+            return list(self._clients.values())
+
+    def remove_client(self, device_id: str):
+        with self._lock:
+            return self._clients.pop(device_id, None) is not None
+
+    def clear_clients(self):
+        with self._lock:
+            self._clients.clear()
+
+    def lease_node(self, max_node: int, on_change=None):
+        return 0
+
+    def next_index(self, key: str, count: int = 1):
+        with self._lock:
+            index = self._round_robin.get(key, 0)
+            self._round_robin[key] = index + count
+            return index
+
+    def stats(self):
+        return {"kind": "local", "seq": self._seq}
+
+
+class SqliteBus:
+    def __init__(
+        self,
+        pool,
+        poll_interval: float = 0.05,
+        batch_size: int = 500,
+        retain_events: int = 10000,
+        lease_ttl: float = 60.0,
+    ):
+        self.pool = pool
+        self.poll_interval = poll_interval
+        self.batch_size = batch_size
+        self.retain_events = retain_events
+        self.lease_ttl = lease_ttl
+        self.node_id = None
+        self._max_node = None
+        self._on_node = None
+        self._renew_at = 0.0
+        self.origin = f"{os.getpid()}-{os.urandom(4).hex()}"
+        self.epoch = None
+        self._last_seq = 0
+        self._loop = None
+        self._on_event = None
+        self._on_control = None
+        self._wake = threading.Event()
+        self._stop = threading.Event()
+        self._thread = None
+        self._polls = 0
+        self._received = 0
+        self._published = 0
+
+    def init(self, conn):
+        conn.execute(
+            "CREATE TABLE IF NOT EXISTS bus_events ("
+            "seq INTEGER PRIMARY KEY AUTOINCREMENT, "
+            "kind TEXT NOT NULL, "
+            "topics TEXT, "
+            "payload TEXT NOT NULL, "
+            "origin TEXT NOT NULL, "
+            "created_at REAL NOT NULL)"
+        )
+        conn.execute("CREATE TABLE IF NOT EXISTS bus_meta (key TEXT PRIMARY KEY, value TEXT NOT NULL)")
+        conn.execute(
+            "CREATE TABLE IF NOT EXISTS client_presence ("
+            "device_id TEXT PRIMARY KEY, "
+            "table_id TEXT NOT NULL, "
+            "last_seen TEXT NOT NULL)"
+        )
+        conn.execute(
+            "CREATE TABLE IF NOT EXISTS node_leases ("
+            "node_id INTEGER PRIMARY KEY, "
+            "origin TEXT NOT NULL, "
+            "expires_at REAL NOT NULL)"
+        )
+        conn.execute(
+            "CREATE TABLE IF NOT EXISTS round_robin ("
+            "key TEXT PRIMARY KEY, "
+            "next_index INTEGER NOT NULL)"
+        )
+        conn.execute("INSERT OR IGNORE INTO bus_meta (key, value) VALUES ('epoch', ?)", (os.urandom(4).hex(),))
+        self.epoch = conn.execute("SELECT value FROM bus_meta WHERE key = 'epoch'").fetchone()[0]
+        self._last_seq = conn.execute("SELECT COALESCE(MAX(seq), 0) FROM bus_events").fetchone()[0]
+
+    def start(self, loop, on_event, on_control):
+        self._loop = loop
+        self._on_event = on_event
+        self._on_control = on_control
+        self._stop.clear()
+        self._thread = threading.Thread(target=self._run, name="event-bus", daemon=True)
+        self._thread.start()
+        return self._last_seq
+
+    def stop(self):
+        self._stop.set()
+        self._wake.set()
+        if self._thread is not None:
+            self._thread.join(timeout=1)
+        if self.node_id is not None:
+            with self.pool.writer() as conn:
+                conn.execute("DELETE FROM node_leases WHERE node_id = ? AND origin = ?", (self.node_id, self.origin))
+            self.node_id = None
+
+    def _insert(self, rows):
+        now = time.time()
+        with self.pool.writer() as conn:
+            conn.executemany(
+                "INSERT INTO bus_events (kind, topics, payload, origin, created_at) VALUES (?, ?, ?, ?, ?)",
+                [
+                    (kind, json.dumps(sorted(topics)) if topics is not None else None, payload, self.origin, now)
+                    for kind, topics, payload in rows
+                ],
+            )
+        self._published += len(rows)
+        self._wake.set()
+
+    async def publish(self, message: dict, topics):
+        await self.publish_many([(message, topics)])
+
+    async def publish_many(self, events):
+        rows = [
+            ("event", topics, json.dumps(message, separators=(",", ":"), ensure_ascii=False))
+            for message, topics in events
+        ]
+        if rows:
+            await self.pool.run(self._insert, rows)
+
+    def notify(self, kind: str, payload):
+        self._insert([(kind, None, json.dumps(payload))])
+
+    def _run(self):
+        while not self._stop.is_set():
+            self._wake.wait(self.poll_interval)
+            self._wake.clear()
+            try:
+                self._poll()
+                if self.node_id is not None and time.monotonic() >= self._renew_at:
+                    self._renew_node()
+            except Exception:
+                logger.exception("Event bus poll failed")
+
+    def _poll(self):
+        self._polls += 1
+        with self.pool.reader() as conn:
+            rows = conn.execute(
+                "SELECT seq, kind, topics, payload, origin FROM bus_events WHERE seq > ? ORDER BY seq LIMIT ?",
+                (self._last_seq, self.batch_size),
+            ).fetchall()
+        for row in rows:
+            self._last_seq = row["seq"]
+            self._received += 1
+            if row["kind"] == "event":
+                topics = frozenset(json.loads(row["topics"]))
+                self._loop.call_soon_threadsafe(self._on_event, row["seq"], topics, encode_event(row["seq"], row["payload"]))
+            elif row["origin"] != self.origin:
+                self._on_control(row["kind"], json.loads(row["payload"]))
+        if len(rows) == self.batch_size:
+            self._wake.set()
+        if self._polls % 1200 == 0:
+            with self.pool.writer() as conn:
+                conn.execute("DELETE FROM bus_events WHERE seq <= ?", (self._last_seq - self.retain_events,))
+
+    def lease_node(self, max_node: int, on_change=None):
+        self._max_node = max_node
+        self._on_node = on_change
+        now = time.time()
+        with self.pool.writer() as conn:
+            conn.execute("BEGIN IMMEDIATE")
+            conn.execute("DELETE FROM node_leases WHERE expires_at < ?", (now,))
+            taken = {row[0] for row in conn.execute("SELECT node_id FROM node_leases")}
+            node_id = next((candidate for candidate in range(max_node + 1) if candidate not in taken), None)
+            if node_id is None:
+                raise RuntimeError("No free node id to lease")
+            conn.execute(
+                "INSERT INTO node_leases (node_id, origin, expires_at) VALUES (?, ?, ?)",
+                (node_id, self.origin, now + self.lease_ttl),
+            )
+        self.node_id = node_id
+        self._renew_at = time.monotonic() + self.lease_ttl / 6
+        return node_id
+
+    def _renew_node(self):
+        with self.pool.writer() as conn:
+            renewed = conn.execute(
+                "UPDATE node_leases SET expires_at = ? WHERE node_id = ? AND origin = ?",
+                (time.time() + self.lease_ttl, self.node_id, self.origin),
+            ).rowcount
+        self._renew_at = time.monotonic() + self.lease_ttl / 6
+        if not renewed:
+            logger.warning("Node id lease %s was lost, leasing a new one", self.node_id)
+            node_id = self.lease_node(self._max_node, self._on_node)
+            if self._on_node is not None:
+                self._on_node(node_id)
+
+    def touch_client(self, device_id: str, table_id: str, last_seen: str):
+        with self.pool.writer() as conn:
+            conn.execute(
+                "INSERT INTO client_presence (device_id, table_id, last_seen) VALUES (?, ?, ?) "
+                "ON CONFLICT(device_id) DO UPDATE SET table_id = excluded.table_id, last_seen = excluded.last_seen",
+                (device_id, table_id, last_seen),
+            )
+
+    def clients(self):
+        with self.pool.reader() as conn:
+            rows = conn.execute("SELECT device_id, table_id, last_seen FROM client_presence").fetchall()
+        return [dict(row) for row in rows]
+
+    def remove_client(self, device_id: str):
+        with self.pool.writer() as conn:
+            return conn.execute("DELETE FROM client_presence WHERE device_id = ?", (device_id,)).rowcount > 0
+
+    def clear_clients(self):
+        with self.pool.writer() as conn:
+            conn.execute("DELETE FROM client_presence")
+
+    def next_index(self, key: str, count: int = 1):
+        with self.pool.writer() as conn:
+            return conn.execute(
+                "INSERT INTO round_robin (key, next_index) VALUES (?, ?) "
+                "ON CONFLICT(key) DO UPDATE SET next_index = next_index + excluded.next_index "
+                "RETURNING next_index - ?",
+                (key, count, count),
+            ).fetchone()[0]
+
+    def stats(self):
+        return {
+            "kind": "sqlite",
+            "origin": self.origin,
+            "node_id": self.node_id,
+            "seq": self._last_seq,
+            "published": self._published,
+            "received": self._received,
+            "polls": self._polls,
+        }
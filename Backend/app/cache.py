@@ -0,0 +1,124 @@
+from collections import OrderedDict
+import gzip
+import hashlib
+import json
+import threading
+import time
+
+
+class MenuSnapshot:
+    def __init__(self, version: int, items: list):
+        self.version = version
+        self.items = items
+        self.index = {item["id"]: item for item in items}
+        self.body = json.dumps(
+            {"items": items},
+            ensure_ascii=False,
+            allow_nan=False,
+            separators=(",", ":"),
+        ).encode("utf-8")
+        self.gzip_body = gzip.compress(self.body, compresslevel=6, mtime=0)
+        digest = hashlib.blake2b(self.body, digest_size=12).hexdigest()
+        self.etag = f'"menu-{digest}"'
+        self.gzip_etag = f'"menu-{digest}-gz"'
+
+
+class MenuCache:
+    def __init__(self, loader):
+        self._loader = loader
+        self._lock = threading.Lock()
+        self._version = 1
+        self._snapshot = None
+        self._hits = 0
+        self._misses = 0
+
+    def get(self):
+        snapshot = self._snapshot
+        if snapshot is not None:
+            self._hits += 1
+            return snapshot
+        with self._lock:
+            if self._snapshot is None:
+                self._misses += 1
+                self._snapshot = MenuSnapshot(self._version, self._loader())
+            return self._snapshot
+
+    def invalidate(self):
+        with self._lock:
+            self._version += 1
+            self._snapshot = None
+
+    def stats(self):
+        return {"version": self._version, "hits": self._hits, "misses": self._misses}
+
+
+class TTLCache:
+    def __init__(self, max_entries: int = 1024, ttl: float = 60.0):
+        self.max_entries = max_entries
+        self.ttl = ttl
+        self._lock = threading.Lock()
+        self._entries = OrderedDict()
+        self._groups = {}
+        self._hits = 0
+        self._misses = 0
+        self._evictions = 0
+        self._invalidations = 0
+
+    def get(self, key, default=None):
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                self._misses += 1
+                return default
+            expires_at, value, _ = entry
+            if expires_at < time.monotonic():
+                self._remove(key)
+                self._misses += 1
+                return default
+            self._entries.move_to_end(key)
+            self._hits += 1
+            return value
+
+    def set(self, key, value, group=None, ttl: float | None = None):
+        expires_at = time.monotonic() + (self.ttl if ttl is None else ttl)
+        with self._lock:
+            if key in self._entries:
+                self._remove(key)
+            self._entries[key] = (expires_at, value, group)
+            if group is not None:
+                self._groups.setdefault(group, set()).add(key)
+            while len(self._entries) > self.max_entries:
+                self._remove(next(iter(self._entries)))
+                self._evictions += 1
+
+    def pop(self, key):
+        with self._lock:
+            if key in self._entries:
+                self._remove(key)
+                self._invalidations += 1
+
+    def invalidate_group(self, group):
+        with self._lock:
+            for key in list(self._groups.get(group, ())):
+                self._remove(key)
+                self._invalidations += 1
+
+    def _remove(self, key):
+        _, _, group = self._entries.pop(key)
+        if group is not None:
+            keys = self._groups.get(group)
+            if keys is not None:
+                keys.discard(key)
+                if not keys:
+                    del self._groups[group]
+
+    def stats(self):
+        with self._lock:
+            return {
+                "entries": len(self._entries),
+                "max_entries": self.max_entries,
+                "hits": self._hits,
+                "misses": self._misses,
+                "evictions": self._evictions,
+                "invalidations": self._invalidations,
+            }
@@ -0,0 +1,116 @@
+import threading
+import time
+
+
+class CooccurrenceModel:
+    def __init__(self, max_items_per_order: int = 50):
+        self.max_items_per_order = max_items_per_order
+        self._lock = threading.Lock()
+        self._counts = {}
+        self._ranked = {}
+        self._high_water = 0
+        self._seen = set()
+        self._orders_seen = 0
+        self._last_build_ms = 0.0
+        self._built_at = None
+        self._pending = None
+
+    def _add_pairs(self, counts: dict, item_ids):
+        distinct = list(dict.fromkeys(item_ids))[: self.max_items_per_order]
+        for item_id in distinct:
+            neighbours = counts.setdefault(item_id, {})
+            for other in distinct:
+                if other != item_id:
+                    neighbours[other] = neighbours.get(other, 0) + 1
+        return distinct
+
+    def rebuild(self, load_rows):
+        started = time.perf_counter()
+        with self._lock:
+            self._pending = []
+        try:
+            rows = load_rows()
+        except BaseException:
+            with self._lock:
+                self._pending = None
+            raise
+        counts = {}
+        high_water = 0
+        orders_seen = 0
+        current_rowid = None
+        current_items = []
+        for order_rowid, item_id in rows:
+            if order_rowid != current_rowid:
+                if current_items:
+                    self._add_pairs(counts, current_items)
+                    orders_seen += 1
+                current_rowid = order_rowid
+                current_items = []
+                high_water = max(high_water, order_rowid)
+            current_items.append(item_id)
+        if current_items:
+            self._add_pairs(counts, current_items)
+            orders_seen += 1
+        with self._lock:
+            seen = set()
+            for order_rowid, item_ids in self._pending:
+                if order_rowid > high_water and order_rowid not in seen:
+                    seen.add(order_rowid)
+                    self._add_pairs(counts, item_ids)
+                    orders_seen += 1
+            self._pending = None
+            self._counts = counts
+            self._ranked = {}
+            self._high_water = high_water
+            self._seen = seen
+            self._orders_seen = orders_seen
+            self._last_build_ms = (time.perf_counter() - started) * 1000
+            self._built_at = time.time()
+
+    def add_order(self, order_rowid: int, item_ids):
+        with self._lock:
+            if self._pending is not None:
+                self._pending.append((order_rowid, item_ids))
+            if order_rowid <= self._high_water or order_rowid in self._seen:
+                return
+            self._seen.add(order_rowid)
+            self._orders_seen += 1
+            for item_id in self._add_pairs(self._counts, item_ids):
+                self._ranked.pop(item_id, None)
+
+    def _ranked_for(self, item_id: str):
+        ranked = self._ranked.get(item_id)
+        if ranked is None:
+            neighbours = self._counts.get(item_id, {})
+            ranked = tuple(sorted(neighbours.items(), key=lambda pair: (-pair[1], pair[0])))
+            self._ranked[item_id] = ranked
+        return ranked
+
+    def related(self, item_id: str, limit: int = 5):
+        with self._lock:
+            return list(self._ranked_for(item_id)[:limit])
+
+    def boosts(self, seed_counts: dict, per_seed: int = 20, weight: float = 1.0):
+        total = sum(seed_counts.values())
+        scores = {}
+        if total <= 0:
+            return scores
+        with self._lock:
+            for seed, count in seed_counts.items():
+                ranked = self._ranked_for(seed)[:per_seed]
+                if not ranked:
+                    continue
+                share = weight * count / total / ranked[0][1]
+                for other, together in ranked:
+                    scores[other] = scores.get(other, 0.0) + together * share
+        return scores
+
+    def stats(self):
+        with self._lock:
+            return {
+                "items": len(self._counts),
+                "pairs": sum(len(neighbours) for neighbours in self._counts.values()),
+                "orders_seen": self._orders_seen,
+                "last_build_ms": self._last_build_ms,
+                "built_at": self._built_at,
+            }
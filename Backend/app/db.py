@@ -0,0 +1,145 @@
+from concurrent.futures import ThreadPoolExecutor
+from contextlib import contextmanager
+import asyncio
+import sqlite3
+import threading
+import time
+
+
+class ConnectionPool:
+    def __init__(
+        self,
+        path: str,
+        cache_size_kib: int = 16384,
+        mmap_size: int = 256 * 1024 * 1024,
+        cached_statements: int = 256,
+        busy_timeout: float = 5.0,
+        max_workers: int = 8,
+    ):
+        self.path = path
+        self.cache_size_kib = cache_size_kib
+        self.mmap_size = mmap_size
+        self.cached_statements = cached_statements
+        self.busy_timeout = busy_timeout
+        self.max_workers = max_workers
+        self._executor = None
+        self._local = threading.local()
+        self._writer = None
+        self._writer_lock = threading.Lock()
+        self._stats_lock = threading.Lock()
+        self._readers = []
+        self._reader_checkouts = 0
+        self._writer_checkouts = 0
+        self._writer_wait_total = 0.0
+        self._writer_wait_max = 0.0
+        self._writer_hold_total = 0.0
+        self._writer_hold_max = 0.0
+        self._writer_in_use = False
+
+    def _connect(self):
+        conn = sqlite3.connect(
+            self.path,
+            timeout=self.busy_timeout,
+            cached_statements=self.cached_statements,
+            check_same_thread=False,
+        )
+        conn.row_factory = sqlite3.Row
+        conn.execute("PRAGMA journal_mode=WAL")
+        conn.execute("PRAGMA synchronous=NORMAL")
+        conn.execute(f"PRAGMA cache_size=-{int(self.cache_size_kib)}")
+        conn.execute(f"PRAGMA mmap_size={int(self.mmap_size)}")
+        conn.execute("PRAGMA temp_store=MEMORY")
+        return conn
+
+    @contextmanager
+    def reader(self):
+        conn = getattr(self._local, "conn", None)
+        if conn is None:
+            conn = self._connect()
+            self._local.conn = conn
+            with self._stats_lock:
+                self._readers.append(conn)
+        with self._stats_lock:
+            self._reader_checkouts += 1
+        yield conn
+
+    @contextmanager
+    def writer(self):
+        requested = time.perf_counter()
+        with self._writer_lock:
+            acquired = time.perf_counter()
+            waited = acquired - requested
+            if self._writer is None:
+                self._writer = self._connect()
+            conn = self._writer
+            with self._stats_lock:
+                self._writer_checkouts += 1
+                self._writer_wait_total += waited
+                self._writer_wait_max = max(self._writer_wait_max, waited)
+                self._writer_in_use = True
+            try:
+                yield conn
+                conn.commit()
+            except BaseException:
+                conn.rollback()
+                raise
+            finally:
+                held = time.perf_counter() - acquired
+                with self._stats_lock:
+                    self._writer_hold_total += held
+                    self._writer_hold_max = max(self._writer_hold_max, held)
+                    self._writer_in_use = False
+
+    def _get_executor(self):
+        if self._executor is None:
+            with self._stats_lock:
+                if self._executor is None:
+                    self._executor = ThreadPoolExecutor(max_workers=self.max_workers, thread_name_prefix="db")
+        return self._executor
+
+    async def run(self, fn, *args):
+        loop = asyncio.get_running_loop()
+        return await loop.run_in_executor(self._get_executor(), lambda: fn(*args))
+
+    async def read(self, fn, *args):
+        return await self.run(self._call_read, fn, args)
+
+    async def write(self, fn, *args):
+        return await self.run(self._call_write, fn, args)
+
+    def _call_read(self, fn, args):
+        with self.reader() as conn:
+            return fn(conn, *args)
+
+    def _call_write(self, fn, args):
+        with self.writer() as conn:
+            return fn(conn, *args)
+
+    def stats(self):
+        with self._stats_lock:
+            writer_checkouts = self._writer_checkouts
+            return {
+                "path": self.path,
+                "readers_open": len(self._readers),
+                "reader_checkouts": self._reader_checkouts,
+                "writer_checkouts": writer_checkouts,
+                "writer_in_use": self._writer_in_use,
+                "writer_wait_ms_avg": (self._writer_wait_total / writer_checkouts * 1000) if writer_checkouts else 0.0,
+                "writer_wait_ms_max": self._writer_wait_max * 1000,
+                "writer_hold_ms_avg": (self._writer_hold_total / writer_checkouts * 1000) if writer_checkouts else 0.0,
+                "writer_hold_ms_max": self._writer_hold_max * 1000,
+            }
+
+    def close(self):
+        if self._executor is not None:
+            self._executor.shutdown(wait=True)
+            self._executor = None
+        with self._writer_lock:
+            if self._writer is not None:
+                self._writer.close()
+                self._writer = None
+        with self._stats_lock:
+            readers, self._readers = self._readers, []
+        for conn in readers:
+            conn.close()
+        self._local = threading.local()
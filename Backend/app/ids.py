@@ -0,0 +1,56 @@
+import threading
+import time
+
+
+EPOCH_MS = 1704067200000
+NODE_BITS = 10
+SEQUENCE_BITS = 12
+MAX_NODE = (1 << NODE_BITS) - 1
+MAX_SEQUENCE = (1 << SEQUENCE_BITS) - 1
+
+
+class IdGenerator:
+    def __init__(self, node_id: int = 0, epoch_ms: int = EPOCH_MS):
+        self.epoch_ms = epoch_ms
+        self._lock = threading.Lock()
+        self._node = 0
+        self._last_ms = 0
+        self._sequence = 0
+        self._issued = 0
+        self._borrowed = 0
+        self._node_changes = 0
+        self.set_node(node_id)
+
+    def set_node(self, node_id: int):
+        if not 0 <= node_id <= MAX_NODE:
+            raise ValueError(f"node_id must be between 0 and {MAX_NODE}")
+        with self._lock:
+            if node_id != self._node:
+                self._node_changes += 1
+            self._node = node_id
+
+    def next_id(self):
+        with self._lock:
+            now = int(time.time() * 1000) - self.epoch_ms
+            if now > self._last_ms:
+                self._last_ms = now
+                self._sequence = 0
+            else:
+                self._sequence = (self._sequence + 1) & MAX_SEQUENCE
+                if self._sequence == 0:
+                    self._last_ms += 1
+                    self._borrowed += 1
+            self._issued += 1
+            return (self._last_ms << (NODE_BITS + SEQUENCE_BITS)) | (self._node << SEQUENCE_BITS) | self._sequence
+
+    def new(self, prefix: str):
+        return f"{prefix}-{self.next_id():016x}"
+
+    def stats(self):
+        with self._lock:
+            return {
+                "node_id": self._node,
+                "node_changes": self._node_changes,
+                "issued": self._issued,
+                "borrowed_ms": self._borrowed,
+            }
@@ -0,0 +1,93 @@
+import asyncio
+import threading
+import time
+
+
+class OrderBatcher:
+    def __init__(self, process, window: float = 0.005, max_batch: int = 64):
+        self.process = process
+        self.window = window
+        self.max_batch = max_batch
+        self._pending = []
+        self._timer = None
+        self._running = False
+        self._lock = threading.Lock()
+        self._batches = 0
+        self._orders = 0
+        self._failed = 0
+        self._batch_max = 0
+        self._wait_total = 0.0
+        self._wait_max = 0.0
+        self._stages = {}
+
+    async def submit(self, item):
+        loop = asyncio.get_running_loop()
+        future = loop.create_future()
+        self._pending.append((item, future, time.perf_counter()))
+        if len(self._pending) >= self.max_batch:
+            self._kick()
+        elif self._timer is None and not self._running:
+            self._timer = loop.call_later(self.window, self._kick)
+        return await future
+
+    def _kick(self):
+        if self._timer is not None:
+            self._timer.cancel()
+            self._timer = None
+        if self._running or not self._pending:
+            return
+        self._running = True
+        asyncio.get_running_loop().create_task(self._run())
+
+    async def _run(self):
+        try:
+            while self._pending:
+                batch, self._pending = self._pending[: self.max_batch], self._pending[self.max_batch :]
+                started = time.perf_counter()
+                try:
+                    results = await self.process([item for item, _, _ in batch])
+                except Exception as exc:
+                    results = [exc] * len(batch)
+                for (_, future, _), result in zip(batch, results):
+                    if future.done():
+                        continue
+                    if isinstance(result, Exception):
+                        future.set_exception(result)
+                    else:
+                        future.set_result(result)
+                waits = [started - submitted for _, _, submitted in batch]
+                with self._lock:
+                    self._batches += 1
+                    self._orders += len(batch)
+                    self._failed += sum(1 for result in results if isinstance(result, Exception))
+                    self._batch_max = max(self._batch_max, len(batch))
+                    self._wait_total += sum(waits)
+                    self._wait_max = max(self._wait_max, *waits)
+                self.record("total", time.perf_counter() - started)
+        finally:
+            self._running = False
+
+    def record(self, stage: str, seconds: float):
+        with self._lock:
+            total, count, peak = self._stages.get(stage, (0.0, 0, 0.0))
+            self._stages[stage] = (total + seconds, count + 1, max(peak, seconds))
+
+    def stats(self):
+        with self._lock:
+            batches = self._batches
+            return {
+                "window_ms": self.window * 1000,
+                "max_batch": self.max_batch,
+                "pending": len(self._pending),
+                "batches": batches,
+                "orders": self._orders,
+                "failed": self._failed,
+                "batch_size_avg": self._orders / batches if batches else 0.0,
+                "batch_size_max": self._batch_max,
+                "queue_wait_ms_avg": (self._wait_total / self._orders * 1000) if self._orders else 0.0,
+                "queue_wait_ms_max": self._wait_max * 1000,
+                "stages": {
+                    stage: {"ms_avg": total / count * 1000, "ms_max": peak * 1000}
+                    for stage, (total, count, peak) in self._stages.items()
+                },
+            }
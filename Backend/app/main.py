@@ -1,17 +1,32 @@
-from datetime import datetime, timedelta
-from typing import Dict, List
-import hashlib
+from datetime import datetime, timedelta, timezone
+from typing import List
+import asyncio
+import base64
 import json
+import logging
 import os
 import sqlite3
+import threading
+import time
 
-from fastapi import FastAPI, HTTPException, Request, WebSocket, WebSocketDisconnect
+from fastapi import FastAPI, HTTPException, Request, Response, WebSocket, WebSocketDisconnect
 from fastapi.staticfiles import StaticFiles
 from fastapi.middleware.cors import CORSMiddleware
 from pydantic import BaseModel
 
+from app.broadcast import Broadcaster
+from app.bus import LocalBus, SqliteBus
+from app.cache import MenuCache, TTLCache
+from app.cooccurrence import CooccurrenceModel
 from app.data import MENU_ITEMS
+from app.db import ConnectionPool
 from app.discovery import start_discovery_responder
+from app.ids import MAX_NODE, IdGenerator
+from app.ingest import OrderBatcher
+from app.passwords import LEGACY_ITERATIONS, HashingOverloaded, HashingPool, hash_password
+from app.recommender import Recommender, meal_tag_for_hour
+from app.tokens import TOKEN_PREFIX, RevocationList, TokenSigner, parse_keys
+from app.trending import PopularityTracker
 
 
 APP_NAME = "Smart Restaurant Server"
@@ -31,10 +46,57 @@ if os.path.isdir(PWA_DIR):
     app.mount("/app", StaticFiles(directory=PWA_DIR, html=True), name="pwa")
 
 TOKEN_TTL_SECONDS = 3600
-_clients: Dict[str, Dict[str, str]] = {}
-_ws_clients: List[WebSocket] = []
-_chef_rr: Dict[str, int] = {}
+SESSION_CACHE_TTL_SECONDS = 60
+INVALID_TOKEN_CACHE_TTL_SECONDS = 5
+SIGNED_TOKENS = os.environ.get("SMART_RESTRO_SIGNED_TOKENS", "") == "1"
+REVOCATION_REFRESH_SECONDS = 5
+SESSION_SWEEP_SECONDS = 300
+SESSION_SWEEP_BATCH = 500
+KDF_ITERATIONS = int(os.environ.get("SMART_RESTRO_KDF_ITERATIONS", LEGACY_ITERATIONS))
+KDF_WORKERS = int(os.environ.get("SMART_RESTRO_KDF_WORKERS", 2))
+KDF_MAX_PENDING = int(os.environ.get("SMART_RESTRO_KDF_MAX_PENDING", 32))
+WS_MAX_BACKLOG = int(os.environ.get("SMART_RESTRO_WS_MAX_BACKLOG", 256))
+WS_SEND_TIMEOUT_SECONDS = 10
+WS_MAX_TOPICS = 64
+TOPIC_KINDS = {"chef", "table", "order", "assignee"}
+WS_REPLAY_EVENTS = 1024
+WS_PING_INTERVAL_SECONDS = float(os.environ.get("SMART_RESTRO_WS_PING_INTERVAL", 20))
+WS_PING_TIMEOUT_SECONDS = float(os.environ.get("SMART_RESTRO_WS_PING_TIMEOUT", 60))
+EVENT_BUS = os.environ.get("SMART_RESTRO_BUS", "local")
 DB_PATH = "app.db"
+COOCCURRENCE_REBUILD_SECONDS = 900
+COOCCURRENCE_BOOST_WEIGHT = 4.0
+COOCCURRENCE_POPULAR_SEEDS = 5
+POPULARITY_HISTORY_DAYS = 56
+ORDERS_PAGE_SIZE = 50
+ORDERS_PAGE_MAX = 200
+OPEN_ORDER_STATUSES = ["placed", "preparing", "ready"]
+ORDER_BATCH_WINDOW_MS = float(os.environ.get("SMART_RESTRO_ORDER_BATCH_MS", 5))
+ORDER_BATCH_MAX = 64
+STRICT_STOCK = os.environ.get("SMART_RESTRO_STRICT_STOCK", "") == "1"
+ID_RETRIES = 3
+NEXT_CHANGE_SEQ_SQL = "(SELECT COALESCE(MAX(change_seq), 0) + 1 FROM orders)"
+_pool = ConnectionPool(DB_PATH)
+_bus = SqliteBus(_pool) if EVENT_BUS == "sqlite" else LocalBus()
+_ids = IdGenerator()
+_cooccurrence = CooccurrenceModel()
+_popularity = PopularityTracker()
+_hasher = HashingPool(KDF_ITERATIONS, max_workers=KDF_WORKERS, max_pending=KDF_MAX_PENDING)
+_broadcaster = Broadcaster(
+    max_backlog=WS_MAX_BACKLOG, send_timeout=WS_SEND_TIMEOUT_SECONDS, replay_events=WS_REPLAY_EVENTS
+)
+_session_cache = TTLCache(max_entries=4096, ttl=SESSION_CACHE_TTL_SECONDS)
+_recommendation_cache = TTLCache(max_entries=2048, ttl=60.0)
+_recommender = Recommender(lambda: _load_recommendation_aggregates())
+_menu_cache = MenuCache(lambda: _load_menu_from_db())
+_order_batcher = OrderBatcher(
+    lambda batch: _ingest_orders(batch), window=ORDER_BATCH_WINDOW_MS / 1000, max_batch=ORDER_BATCH_MAX
+)
+_token_signer = TokenSigner(parse_keys(os.environ.get("SMART_RESTRO_TOKEN_KEYS"))) if SIGNED_TOKENS else None
+_revocations = RevocationList()
+_session_sweep_stats = {"runs": 0, "reclaimed": 0, "last_reclaimed": 0, "last_run_ms": 0.0, "last_run_at": None}
+_background_stop = threading.Event()
+logger = logging.getLogger(__name__)
 
 
 class LoginRequest(BaseModel):
@@ -105,17 +167,42 @@ class PingRequest(BaseModel):
 def _startup():
     start_discovery_responder(HTTP_PORT)
     _init_db()
-
-
-def _get_db():
-    conn = sqlite3.connect(DB_PATH)
-    conn.row_factory = sqlite3.Row
-    return conn
+    _ids.set_node(_bus.lease_node(MAX_NODE, _ids.set_node))
+    _load_popularity_history()
+    _broadcaster.start(_bus.epoch, _bus.start(asyncio.get_running_loop(), _broadcaster.deliver, _apply_control))
+    _broadcaster.start_heartbeat(WS_PING_INTERVAL_SECONDS, WS_PING_TIMEOUT_SECONDS)
+    _background_stop.clear()
+    _start_periodic("cooccurrence-rebuild", COOCCURRENCE_REBUILD_SECONDS, _rebuild_cooccurrence)
+    _start_periodic("session-sweeper", SESSION_SWEEP_SECONDS, _sweep_expired_sessions)
+    if _token_signer is not None:
+        _start_periodic("token-revocations", REVOCATION_REFRESH_SECONDS, _refresh_revocations)
+
+
+@app.on_event("shutdown")
+def _shutdown():
+    _background_stop.set()
+    _broadcaster.stop()
+    _bus.stop()
+    _hasher.close()
+    _pool.close()
+
+
+def _start_periodic(name: str, interval: float, job):
+    def _run():
+        while not _background_stop.is_set():
+            try:
+                job()
+            except Exception:
+                logger.exception("Background job %s failed", name)
+            _background_stop.wait(interval)
+
+    thread = threading.Thread(target=_run, name=name, daemon=True)
+    thread.start()
+    return thread
 
 
 def _init_db():
-    conn = _get_db()
-    try:
+    with _pool.writer() as conn:
         conn.execute(
             "CREATE TABLE IF NOT EXISTS users ("
             "user_id TEXT PRIMARY KEY, "
@@ -129,7 +216,8 @@ def _init_db():
             "user_id TEXT NOT NULL, "
             "role TEXT NOT NULL, "
             "specialty TEXT, "
-            "expires_at TEXT NOT NULL)"
+            "expires_at TEXT NOT NULL, "
+            "expires_epoch INTEGER)"
         )
         conn.execute(
             "CREATE TABLE IF NOT EXISTS menu_items ("
@@ -155,7 +243,9 @@ def _init_db():
             "assigned_to TEXT, "
             "total REAL NOT NULL DEFAULT 0, "
             "payment_status TEXT NOT NULL DEFAULT 'unpaid', "
-            "created_at TEXT NOT NULL)"
+            "created_at TEXT NOT NULL, "
+            "change_seq INTEGER, "
+            "updated_at TEXT)"
         )
         conn.execute(
             "CREATE TABLE IF NOT EXISTS payments ("
@@ -179,6 +269,64 @@ def _init_db():
             "stock INTEGER NOT NULL, "
             "updated_at TEXT NOT NULL)"
         )
+        conn.execute(
+            "CREATE TABLE IF NOT EXISTS order_items ("
+            "order_id TEXT NOT NULL, "
+            "line_no INTEGER NOT NULL, "
+            "item_id TEXT NOT NULL, "
+            "name TEXT, "
+            "category TEXT NOT NULL, "
+            "quantity INTEGER NOT NULL, "
+            "price REAL NOT NULL DEFAULT 0, "
+            "assigned_to TEXT, "
+            "status TEXT NOT NULL DEFAULT 'placed', "
+            "PRIMARY KEY (order_id, line_no))"
+        )
+        conn.execute(
+            "CREATE TABLE IF NOT EXISTS server_secrets ("
+            "name TEXT PRIMARY KEY, "
+            "value TEXT NOT NULL)"
+        )
+        conn.execute(
+            "CREATE TABLE IF NOT EXISTS token_revocations ("
+            "kind TEXT NOT NULL, "
+            "subject TEXT NOT NULL, "
+            "revoked_at INTEGER NOT NULL DEFAULT 0, "
+            "expires_at INTEGER NOT NULL, "
+            "PRIMARY KEY (kind, subject))"
+        )
+        conn.execute("CREATE INDEX IF NOT EXISTS idx_order_items_category ON order_items (category)")
+        conn.execute("CREATE INDEX IF NOT EXISTS idx_order_items_assigned_to ON order_items (assigned_to)")
+        conn.execute("CREATE INDEX IF NOT EXISTS idx_order_items_item_id ON order_items (item_id)")
+        conn.execute("CREATE INDEX IF NOT EXISTS idx_orders_user_id ON orders (user_id)")
+        conn.execute("CREATE INDEX IF NOT EXISTS idx_orders_created ON orders (created_at, order_id)")
+        conn.execute("CREATE INDEX IF NOT EXISTS idx_orders_status_created ON orders (status, created_at, order_id)")
+        conn.execute("CREATE INDEX IF NOT EXISTS idx_orders_table_created ON orders (table_id, created_at, order_id)")
+        conn.execute(
+            "CREATE TABLE IF NOT EXISTS item_popularity ("
+            "item_id TEXT PRIMARY KEY, "
+            "quantity INTEGER NOT NULL DEFAULT 0)"
+        )
+        conn.execute(
+            "CREATE TABLE IF NOT EXISTS item_ratings ("
+            "item_id TEXT PRIMARY KEY, "
+            "rating_sum INTEGER NOT NULL DEFAULT 0, "
+            "rating_count INTEGER NOT NULL DEFAULT 0)"
+        )
+        conn.execute(
+            "CREATE TABLE IF NOT EXISTS user_item_counts ("
+            "user_id TEXT NOT NULL, "
+            "item_id TEXT NOT NULL, "
+            "quantity INTEGER NOT NULL DEFAULT 0, "
+            "PRIMARY KEY (user_id, item_id))"
+        )
+        conn.execute(
+            "CREATE TABLE IF NOT EXISTS user_category_counts ("
+            "user_id TEXT NOT NULL, "
+            "category TEXT NOT NULL, "
+            "quantity INTEGER NOT NULL DEFAULT 0, "
+            "PRIMARY KEY (user_id, category))"
+        )
         try:
             conn.execute("ALTER TABLE users ADD COLUMN specialty TEXT")
         except sqlite3.OperationalError:
@@ -199,12 +347,197 @@ def _init_db():
             conn.execute("ALTER TABLE orders ADD COLUMN payment_status TEXT")
         except sqlite3.OperationalError:
             pass
-        conn.commit()
+        try:
+            conn.execute("ALTER TABLE orders ADD COLUMN change_seq INTEGER")
+        except sqlite3.OperationalError:
+            pass
+        try:
+            conn.execute("ALTER TABLE orders ADD COLUMN updated_at TEXT")
+        except sqlite3.OperationalError:
+            pass
+        conn.execute(
+            f"UPDATE orders SET change_seq = {NEXT_CHANGE_SEQ_SQL} + rowid, updated_at = created_at "
+            "WHERE change_seq IS NULL"
+        )
+        conn.execute("CREATE UNIQUE INDEX IF NOT EXISTS idx_orders_change_seq ON orders (change_seq)")
+        try:
+            conn.execute("ALTER TABLE sessions ADD COLUMN expires_epoch INTEGER")
+        except sqlite3.OperationalError:
+            pass
+        conn.execute(
+            "UPDATE sessions SET expires_epoch = CAST(strftime('%s', REPLACE(expires_at, 'Z', '')) AS INTEGER) "
+            "WHERE expires_epoch IS NULL"
+        )
+        conn.execute("CREATE INDEX IF NOT EXISTS idx_sessions_expires_epoch ON sessions (expires_epoch)")
+        conn.execute("CREATE INDEX IF NOT EXISTS idx_sessions_user_id ON sessions (user_id)")
+        _migrate_order_items(conn)
+        _rebuild_recommendation_aggregates(conn)
         _seed_default_users(conn)
         _seed_menu(conn)
         _seed_inventory(conn)
-    finally:
-        conn.close()
+        _bus.init(conn)
+        if _token_signer is not None and not _token_signer.keys:
+            _token_signer.set_keys({"db": _shared_token_secret(conn)})
+    _menu_cache.invalidate()
+
+
+def _shared_token_secret(conn):
+    conn.execute(
+        "INSERT OR IGNORE INTO server_secrets (name, value) VALUES ('token_key', ?)",
+        (os.urandom(32).hex(),),
+    )
+    return conn.execute("SELECT value FROM server_secrets WHERE name = 'token_key'").fetchone()[0].encode("ascii")
+
+
+def _migrate_order_items(conn):
+    rows = conn.execute(
+        "SELECT order_id, status, items_json FROM orders WHERE items_json != '[]' "
+        "AND order_id NOT IN (SELECT order_id FROM order_items)"
+    ).fetchall()
+    for row in rows:
+        lines = []
+        for line_no, item in enumerate(json.loads(row["items_json"])):
+            lines.append(
+                (
+                    row["order_id"],
+                    line_no,
+                    item["item_id"],
+                    item.get("name"),
+                    (item.get("category") or "unknown").lower(),
+                    item["quantity"],
+                    item.get("price") or 0,
+                    item.get("assigned_to"),
+                    row["status"],
+                )
+            )
+        _insert_order_items(conn, lines)
+    conn.executemany("UPDATE orders SET items_json = '[]' WHERE order_id = ?", [(row["order_id"],) for row in rows])
+
+
+def _rebuild_recommendation_aggregates(conn):
+    if conn.execute("SELECT 1 FROM item_popularity LIMIT 1").fetchone():
+        return
+    if not conn.execute("SELECT 1 FROM order_items LIMIT 1").fetchone():
+        return
+    conn.execute(
+        "INSERT INTO item_popularity (item_id, quantity) "
+        "SELECT item_id, SUM(quantity) FROM order_items GROUP BY item_id"
+    )
+    conn.execute("DELETE FROM user_item_counts")
+    conn.execute(
+        "INSERT INTO user_item_counts (user_id, item_id, quantity) "
+        "SELECT orders.user_id, order_items.item_id, SUM(order_items.quantity) FROM order_items "
+        "JOIN orders ON orders.order_id = order_items.order_id "
+        "GROUP BY orders.user_id, order_items.item_id"
+    )
+    conn.execute("DELETE FROM user_category_counts")
+    conn.execute(
+        "INSERT INTO user_category_counts (user_id, category, quantity) "
+        "SELECT orders.user_id, order_items.category, SUM(order_items.quantity) FROM order_items "
+        "JOIN orders ON orders.order_id = order_items.order_id "
+        "GROUP BY orders.user_id, order_items.category"
+    )
+    conn.execute("DELETE FROM item_ratings")
+    conn.execute(
+        "INSERT INTO item_ratings (item_id, rating_sum, rating_count) "
+        "SELECT order_items.item_id, SUM(ratings.rating), COUNT(*) FROM order_items "
+        "JOIN ratings ON ratings.order_id = order_items.order_id GROUP BY order_items.item_id"
+    )
+
+
+def _record_order_aggregates(conn, orders: list):
+    lines = [(order["user_id"], item) for order in orders for item in order["items"]]
+    conn.executemany(
+        "INSERT INTO item_popularity (item_id, quantity) VALUES (?, ?) "
+        "ON CONFLICT(item_id) DO UPDATE SET quantity = quantity + excluded.quantity",
+        [(item["item_id"], item["quantity"]) for _, item in lines],
+    )
+    conn.executemany(
+        "INSERT INTO user_item_counts (user_id, item_id, quantity) VALUES (?, ?, ?) "
+        "ON CONFLICT(user_id, item_id) DO UPDATE SET quantity = quantity + excluded.quantity",
+        [(user_id, item["item_id"], item["quantity"]) for user_id, item in lines],
+    )
+    conn.executemany(
+        "INSERT INTO user_category_counts (user_id, category, quantity) VALUES (?, ?, ?) "
+        "ON CONFLICT(user_id, category) DO UPDATE SET quantity = quantity + excluded.quantity",
+        [(user_id, item["category"], item["quantity"]) for user_id, item in lines],
+    )
+
+
+def _record_rating_aggregates(conn, order_id: str, rating_delta: int, count_delta: int):
+    conn.execute(
+        "INSERT INTO item_ratings (item_id, rating_sum, rating_count) "
+        "SELECT item_id, COUNT(*) * ?, COUNT(*) * ? FROM order_items WHERE order_id = ? GROUP BY item_id "
+        "ON CONFLICT(item_id) DO UPDATE SET rating_sum = rating_sum + excluded.rating_sum, "
+        "rating_count = rating_count + excluded.rating_count",
+        (rating_delta, count_delta, order_id),
+    )
+
+
+def _parse_timestamp(value: str):
+    return datetime.fromisoformat(value.replace("Z", "")).replace(tzinfo=timezone.utc).timestamp()
+
+
+def _load_popularity_history():
+    cutoff = (datetime.utcnow() - timedelta(days=POPULARITY_HISTORY_DAYS)).isoformat() + "Z"
+    with _pool.reader() as conn:
+        rows = conn.execute(
+            "SELECT order_items.item_id, order_items.quantity, orders.created_at FROM order_items "
+            "JOIN orders ON orders.order_id = order_items.order_id "
+            "WHERE orders.created_at >= ? ORDER BY orders.created_at",
+            (cutoff,),
+        ).fetchall()
+    for row in rows:
+        _popularity.add(row["item_id"], row["quantity"], _parse_timestamp(row["created_at"]))
+
+
+def _load_recommendation_aggregates():
+    popularity = _popularity.scores()
+    with _pool.reader() as conn:
+        rating_rows = conn.execute(
+            "SELECT item_id, rating_sum, rating_count FROM item_ratings WHERE rating_count > 0"
+        ).fetchall()
+    rating_sums = {row["item_id"]: row["rating_sum"] for row in rating_rows}
+    rating_counts = {row["item_id"]: row["rating_count"] for row in rating_rows}
+    return popularity, rating_sums, rating_counts
+
+
+def _load_cooccurrence_rows():
+    with _pool.reader() as conn:
+        return conn.execute(
+            "SELECT orders.rowid, order_items.item_id FROM order_items "
+            "JOIN orders ON orders.order_id = order_items.order_id "
+            "ORDER BY orders.rowid, order_items.line_no"
+        ).fetchall()
+
+
+def _rebuild_cooccurrence():
+    _cooccurrence.rebuild(_load_cooccurrence_rows)
+
+
+def _insert_order_items(conn, lines: list):
+    conn.executemany(
+        "INSERT INTO order_items (order_id, line_no, item_id, name, category, quantity, price, assigned_to, status) "
+        "VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?)",
+        lines,
+    )
+
+
+def _group_order_items(rows):
+    grouped = {}
+    for row in rows:
+        grouped.setdefault(row["order_id"], []).append(
+            {
+                "item_id": row["item_id"],
+                "quantity": row["quantity"],
+                "category": row["category"],
+                "name": row["name"],
+                "price": row["price"],
+                "assigned_to": row["assigned_to"],
+                "status": row["status"],
+            }
+        )
+    return grouped
 
 
 def _seed_default_users(conn):
@@ -213,15 +546,15 @@ def _seed_default_users(conn):
         return
     conn.execute(
         "INSERT INTO users (user_id, password, role, specialty) VALUES (?, ?, ?, ?)",
-        ("demo", _hash_password("demo123"), "customer", None),
+        ("demo", hash_password("demo123", KDF_ITERATIONS), "customer", None),
     )
     conn.execute(
         "INSERT INTO users (user_id, password, role, specialty) VALUES (?, ?, ?, ?)",
-        ("admin", _hash_password("admin123"), "admin", None),
+        ("admin", hash_password("admin123", KDF_ITERATIONS), "admin", None),
     )
     conn.execute(
         "INSERT INTO users (user_id, password, role, specialty) VALUES (?, ?, ?, ?)",
-        ("chef1", _hash_password("chef123"), "chef", "pizza"),
+        ("chef1", hash_password("chef123", KDF_ITERATIONS), "chef", "pizza"),
     )
     conn.commit()
 
@@ -243,18 +576,29 @@ def _seed_menu(conn):
     conn.commit()
 
 
-def _hash_password(password: str):
-    salt = os.urandom(16).hex()
-    digest = hashlib.pbkdf2_hmac("sha256", password.encode("utf-8"), salt.encode("utf-8"), 100000).hex()
-    return f"{salt}${digest}"
+def _hashing_overloaded():
+    return HTTPException(status_code=503, detail="Too many sign-ins in progress, retry shortly", headers={"Retry-After": "1"})
+
+
+async def _hash_password(password: str):
+    try:
+        return await _hasher.hash(password)
+    except HashingOverloaded:
+        raise _hashing_overloaded()
 
 
-def _verify_password(stored: str, password: str):
-    if "$" not in stored:
-        return stored == password
-    salt, digest = stored.split("$", 1)
-    check = hashlib.pbkdf2_hmac("sha256", password.encode("utf-8"), salt.encode("utf-8"), 100000).hex()
-    return check == digest
+async def _verify_password(stored: str, password: str):
+    try:
+        return await _hasher.verify(stored, password)
+    except HashingOverloaded:
+        raise _hashing_overloaded()
+
+
+def _hash_password_blocking(password: str):
+    try:
+        return _hasher.hash_blocking(password)
+    except HashingOverloaded:
+        raise _hashing_overloaded()
 
 
 def _seed_inventory(conn):
@@ -275,39 +619,30 @@ def _parse_specialties(value: str | None):
     return [part for part in parts if part]
 
 
-def _get_chefs_by_category(category: str):
-    conn = _get_db()
-    try:
+def _assign_chefs(categories: list):
+    with _pool.reader() as conn:
         rows = conn.execute(
             "SELECT user_id, specialty FROM users WHERE role = 'chef' ORDER BY user_id"
         ).fetchall()
-    finally:
-        conn.close()
-    matches = []
-    for row in rows:
-        specialties = _parse_specialties(row["specialty"])
-        if category.lower() in specialties:
-            matches.append(row["user_id"])
-    return matches
-
-
-def _auto_assign_chef(category: str):
-    chefs = _get_chefs_by_category(category)
-    if not chefs:
-        return None
-    index = _chef_rr.get(category, 0) % len(chefs)
-    _chef_rr[category] = index + 1
-    return chefs[index]
+    specialties = [(row["user_id"], _parse_specialties(row["specialty"])) for row in rows]
+    queues = {}
+    for category in dict.fromkeys(categories):
+        chefs = [user_id for user_id, parsed in specialties if category in parsed]
+        start = _bus.next_index(f"chef:{category}", categories.count(category)) if chefs else 0
+        queues[category] = (chefs, start)
+    assigned = []
+    for category in categories:
+        chefs, index = queues[category]
+        assigned.append(chefs[index % len(chefs)] if chefs else None)
+        queues[category] = (chefs, index + 1)
+    return assigned
 
 
 def _load_menu_from_db():
-    conn = _get_db()
-    try:
+    with _pool.reader() as conn:
         rows = conn.execute(
             "SELECT item_id, name, price, tags_json, category FROM menu_items ORDER BY name"
         ).fetchall()
-    finally:
-        conn.close()
     items = []
     for row in rows:
         items.append(
@@ -322,18 +657,51 @@ def _load_menu_from_db():
     return items
 
 
-def _adjust_inventory(items_payload: list):
-    conn = _get_db()
-    try:
-        for item in items_payload:
-            conn.execute(
-                "UPDATE inventory SET stock = CASE WHEN stock - ? < 0 THEN 0 ELSE stock - ? END, "
-                "updated_at = ? WHERE item_id = ?",
-                (item["quantity"], item["quantity"], datetime.utcnow().isoformat() + "Z", item["item_id"]),
-            )
-        conn.commit()
-    finally:
-        conn.close()
+def _stock_demand(items_payload: list):
+    demand = {}
+    for item in items_payload:
+        demand[item["item_id"]] = demand.get(item["item_id"], 0) + item["quantity"]
+    values = ",".join(["(?, ?)"] * len(demand))
+    return (
+        f"(SELECT column1 AS item_id, column2 AS quantity FROM (VALUES {values})) AS demand",
+        [value for pair in demand.items() for value in pair],
+    )
+
+
+def _adjust_inventory(conn, items_payload: list, updated_at: str):
+    if not items_payload:
+        return
+    demand, params = _stock_demand(items_payload)
+    conn.execute(
+        f"UPDATE inventory SET stock = MAX(stock - demand.quantity, 0), updated_at = ? FROM {demand} "
+        "WHERE inventory.item_id = demand.item_id",
+        (updated_at, *params),
+    )
+
+
+def _reserve_stock(conn, items_payload: list, updated_at: str):
+    demand, params = _stock_demand(items_payload)
+    conn.execute("SAVEPOINT reserve_stock")
+    reserved = conn.execute(
+        f"UPDATE inventory SET stock = stock - demand.quantity, updated_at = ? FROM {demand} "
+        "WHERE inventory.item_id = demand.item_id AND inventory.stock >= demand.quantity",
+        (updated_at, *params),
+    ).rowcount
+    tracked = conn.execute(
+        f"SELECT COUNT(*) FROM {demand} JOIN inventory ON inventory.item_id = demand.item_id",
+        params,
+    ).fetchone()[0]
+    if reserved == tracked:
+        conn.execute("RELEASE reserve_stock")
+        return []
+    conn.execute("ROLLBACK TO reserve_stock")
+    conn.execute("RELEASE reserve_stock")
+    rows = conn.execute(
+        f"SELECT demand.item_id FROM {demand} JOIN inventory ON inventory.item_id = demand.item_id "
+        "WHERE inventory.stock < demand.quantity",
+        params,
+    ).fetchall()
+    return [row[0] for row in rows]
 
 
 @app.get("/api/health")
@@ -341,54 +709,164 @@ def health():
     return {"status": "ok", "server_time": datetime.utcnow().isoformat() + "Z"}
 
 
+@app.get("/api/metrics")
+def metrics(request: Request):
+    _require_role(request, "admin")
+    return {
+        "db": _pool.stats(),
+        "menu_cache": _menu_cache.stats(),
+        "recommendation_cache": _recommendation_cache.stats(),
+        "cooccurrence": _cooccurrence.stats(),
+        "popularity": _popularity.stats(),
+        "session_cache": _session_cache.stats(),
+        "token_revocations": _revocations.stats(),
+        "session_sweeper": dict(_session_sweep_stats),
+        "password_hashing": _hasher.stats(),
+        "websockets": _broadcaster.stats(),
+        "event_bus": _bus.stats(),
+        "order_ingest": _order_batcher.stats(),
+        "ids": _ids.stats(),
+    }
+
+
 @app.websocket("/ws/orders")
 async def orders_ws(websocket: WebSocket):
     await websocket.accept()
-    _ws_clients.append(websocket)
+    connection = _broadcaster.connect(websocket)
     try:
+        requested = websocket.query_params.get("topics")
+        if requested:
+            await _subscribe(
+                connection,
+                websocket,
+                requested.split(","),
+                websocket.query_params.get("last_seq"),
+                websocket.query_params.get("epoch"),
+            )
         while True:
-            await websocket.receive_text()
+            text = await websocket.receive_text()
+            _broadcaster.touch(connection)
+            try:
+                message = json.loads(text)
+            except ValueError:
+                continue
+            if not isinstance(message, dict) or not isinstance(message.get("topics"), list):
+                continue
+            topics = [topic for topic in message["topics"] if isinstance(topic, str)]
+            if message.get("type") == "subscribe":
+                await _subscribe(connection, websocket, topics, message.get("last_seq"), message.get("epoch"))
+            elif message.get("type") == "unsubscribe":
+                _broadcaster.unsubscribe(connection, topics)
     except WebSocketDisconnect:
-        if websocket in _ws_clients:
-            _ws_clients.remove(websocket)
+        pass
+    finally:
+        _broadcaster.disconnect(connection)
+
+
+async def _subscribe(connection, websocket: WebSocket, topics: List[str], last_seq=None, epoch=None):
+    try:
+        session = await _pool.run(_require_session, websocket)
+    except HTTPException as exc:
+        _broadcaster.send(connection, {"type": "error", "detail": exc.detail})
+        return
+    accepted, rejected, unknown = await _pool.run(_authorize_topics, session, topics)
+    if unknown:
+        _broadcaster.send(connection, {"type": "error", "detail": f"Unknown topics: {', '.join(unknown)}"})
+    rejected += unknown
+    added = [topic for topic in accepted if topic not in connection.topics]
+    room = max(WS_MAX_TOPICS - len(connection.topics), 0)
+    _broadcaster.subscribe(connection, added[:room])
+    rejected += added[room:]
+    try:
+        last_seq = int(last_seq) if last_seq is not None else None
+    except (TypeError, ValueError):
+        last_seq = None
+    missed = _broadcaster.missed(connection, last_seq, epoch) if last_seq is not None else None
+    _broadcaster.send(
+        connection,
+        {
+            "type": "subscribed",
+            "epoch": _broadcaster.epoch,
+            "seq": last_seq if missed is not None else connection.last_seq,
+            "resumed": missed is not None,
+            "topics": sorted(connection.topics),
+            "rejected": rejected,
+        },
+    )
+    if missed is not None:
+        _broadcaster.replay(connection, last_seq, missed)
+
+
+def _authorize_topics(session: dict, topics: List[str]):
+    role = session.get("role")
+    user_id = session.get("user_id")
+    chef_topics = [f"chef:{specialty}" for specialty in _parse_specialties(session.get("specialty"))] or ["chef:*"]
+    accepted = []
+    rejected = []
+    unknown = []
+    order_ids = []
+    for topic in dict.fromkeys(topic.strip() for topic in topics if topic.strip()):
+        kind, _, value = topic.partition(":")
+        if topic not in ("admin", "kitchen") and (kind not in TOPIC_KINDS or not value):
+            unknown.append(topic)
+        elif role == "admin" and topic != "kitchen":
+            accepted.append(topic)
+        elif role == "chef" and topic == "kitchen":
+            accepted.extend(chef_topics)
+            accepted.append(f"assignee:{user_id}")
+        elif role == "chef" and (topic in chef_topics or topic == f"assignee:{user_id}"):
+            accepted.append(topic)
+        elif role in ("chef", "customer") and kind == "order":
+            order_ids.append(value)
+        else:
+            rejected.append(topic)
+    if order_ids:
+        placeholders = ",".join(["?"] * len(order_ids))
+        owner = (
+            "order_id IN (SELECT order_id FROM order_items WHERE assigned_to = ?)" if role == "chef" else "user_id = ?"
+        )
+        with _pool.reader() as conn:
+            owned = {
+                row["order_id"]
+                for row in conn.execute(
+                    f"SELECT order_id FROM orders WHERE {owner} AND order_id IN ({placeholders})",
+                    (user_id, *order_ids),
+                )
+            }
+        accepted.extend(f"order:{order_id}" for order_id in order_ids if order_id in owned)
+        rejected.extend(f"order:{order_id}" for order_id in order_ids if order_id not in owned)
+    return list(dict.fromkeys(accepted)), rejected, unknown
+
+
+def _load_credentials(conn, user_id: str):
+    return conn.execute(
+        "SELECT user_id, password, role, specialty FROM users WHERE user_id = ?",
+        (user_id,),
+    ).fetchone()
+
+
+def _store_rehashed_password(conn, user_id: str, previous: str, rehashed: str):
+    conn.execute(
+        "UPDATE users SET password = ? WHERE user_id = ? AND password = ?",
+        (rehashed, user_id, previous),
+    )
 
 
 @app.post("/api/login")
-def login(payload: LoginRequest):
+async def login(payload: LoginRequest):
     if not payload.device_id or not payload.user_id or not payload.password or not payload.table_id:
         raise HTTPException(status_code=400, detail="device_id, user_id, password, table_id required")
-    conn = _get_db()
-    try:
-        row = conn.execute(
-            "SELECT user_id, password, role, specialty FROM users WHERE user_id = ?",
-            (payload.user_id,),
-        ).fetchone()
-    finally:
-        conn.close()
-    if not row or not _verify_password(row["password"], payload.password):
+    row = await _pool.read(_load_credentials, payload.user_id)
+    if not row or not await _verify_password(row["password"], payload.password):
         raise HTTPException(status_code=401, detail="Invalid credentials")
-    if "$" not in row["password"]:
-        conn = _get_db()
+    if _hasher.needs_rehash(row["password"]):
         try:
-            conn.execute(
-                "UPDATE users SET password = ? WHERE user_id = ?",
-                (_hash_password(payload.password), payload.user_id),
-            )
-            conn.commit()
-        finally:
-            conn.close()
-    token = f"{payload.device_id}-{int(datetime.utcnow().timestamp())}"
-    expires_at = (datetime.utcnow() + timedelta(seconds=TOKEN_TTL_SECONDS)).isoformat() + "Z"
-    conn = _get_db()
-    try:
-        conn.execute(
-            "INSERT OR REPLACE INTO sessions (token, user_id, role, specialty, expires_at) "
-            "VALUES (?, ?, ?, ?, ?)",
-            (token, payload.user_id, row["role"], row["specialty"], expires_at),
-        )
-        conn.commit()
-    finally:
-        conn.close()
+            rehashed = await _hasher.hash(payload.password)
+        except HashingOverloaded:
+            rehashed = None
+        if rehashed:
+            await _pool.write(_store_rehashed_password, payload.user_id, row["password"], rehashed)
+    token, expires_at = await _pool.run(_open_session, payload, row)
     return {
         "token": token,
         "welcome": f"Hello {payload.user_id}",
@@ -398,6 +876,31 @@ def login(payload: LoginRequest):
     }
 
 
+def _open_session(payload: LoginRequest, row):
+    if _token_signer is not None:
+        token, claims = _token_signer.issue(payload.user_id, row["role"], row["specialty"], TOKEN_TTL_SECONDS)
+        expires_at = datetime.utcfromtimestamp(claims["exp"]).isoformat() + "Z"
+    else:
+        token = f"{payload.device_id}-{int(datetime.utcnow().timestamp())}"
+        expires = datetime.utcnow() + timedelta(seconds=TOKEN_TTL_SECONDS)
+        expires_at = expires.isoformat() + "Z"
+        with _pool.writer() as conn:
+            conn.execute(
+                "INSERT OR REPLACE INTO sessions (token, user_id, role, specialty, expires_at, expires_epoch) "
+                "VALUES (?, ?, ?, ?, ?, ?)",
+                (
+                    token,
+                    payload.user_id,
+                    row["role"],
+                    row["specialty"],
+                    expires_at,
+                    int(expires.replace(tzinfo=timezone.utc).timestamp()),
+                ),
+            )
+        _notify("session_token", token)
+    return token, expires_at
+
+
 def _get_token(request: Request):
     token = request.headers.get("X-Token")
     if not token:
@@ -409,34 +912,128 @@ def _require_session(request: Request):
     token = _get_token(request)
     if not token:
         raise HTTPException(status_code=401, detail="Invalid token")
-    conn = _get_db()
-    try:
+    if _token_signer is not None and token.startswith(TOKEN_PREFIX):
+        return _verify_signed_session(token)
+    cached = _session_cache.get(token)
+    if cached is False:
+        raise HTTPException(status_code=401, detail="Invalid token")
+    if cached is None:
+        cached = _load_session(token)
+    if cached["expires_at"] < time.time():
+        with _pool.writer() as conn:
+            conn.execute("DELETE FROM sessions WHERE token = ?", (token,))
+        _notify("session_token", token)
+        raise HTTPException(status_code=401, detail="Token expired")
+    return {
+        "token": cached["token"],
+        "user_id": cached["user_id"],
+        "role": cached["role"],
+        "specialty": cached["specialty"],
+    }
+
+
+def _verify_signed_session(token: str):
+    claims = _token_signer.verify(token)
+    if claims is None or _revocations.is_revoked(claims):
+        raise HTTPException(status_code=401, detail="Invalid token")
+    if claims["exp"] < time.time():
+        raise HTTPException(status_code=401, detail="Token expired")
+    return {
+        "token": token,
+        "user_id": claims["u"],
+        "role": claims["r"],
+        "specialty": claims["s"],
+    }
+
+
+def _revoke_user_tokens(conn, user_id: str):
+    if _token_signer is None:
+        return
+    revoked_at = int(time.time() * 1000)
+    conn.execute(
+        "INSERT INTO token_revocations (kind, subject, revoked_at, expires_at) VALUES ('user', ?, ?, ?) "
+        "ON CONFLICT(kind, subject) DO UPDATE SET revoked_at = excluded.revoked_at, expires_at = excluded.expires_at",
+        (user_id, revoked_at, revoked_at // 1000 + TOKEN_TTL_SECONDS),
+    )
+    _revocations.revoke_user(user_id, revoked_at)
+
+
+def _sweep_expired_sessions():
+    started = time.perf_counter()
+    now = int(time.time())
+    reclaimed = 0
+    while not _background_stop.is_set():
+        with _pool.writer() as conn:
+            cur = conn.execute(
+                "DELETE FROM sessions WHERE rowid IN "
+                "(SELECT rowid FROM sessions WHERE expires_epoch < ? LIMIT ?)",
+                (now, SESSION_SWEEP_BATCH),
+            )
+        reclaimed += cur.rowcount
+        if cur.rowcount < SESSION_SWEEP_BATCH:
+            break
+        time.sleep(0.01)
+    _session_sweep_stats["runs"] += 1
+    _session_sweep_stats["reclaimed"] += reclaimed
+    _session_sweep_stats["last_reclaimed"] = reclaimed
+    _session_sweep_stats["last_run_ms"] = (time.perf_counter() - started) * 1000
+    _session_sweep_stats["last_run_at"] = datetime.utcnow().isoformat() + "Z"
+
+
+def _refresh_revocations():
+    with _pool.writer() as conn:
+        conn.execute("DELETE FROM token_revocations WHERE expires_at < ?", (int(time.time()),))
+    with _pool.reader() as conn:
+        rows = conn.execute("SELECT kind, subject, revoked_at, expires_at FROM token_revocations").fetchall()
+    tokens = {row["subject"]: row["expires_at"] for row in rows if row["kind"] == "token"}
+    users = {row["subject"]: row["revoked_at"] for row in rows if row["kind"] == "user"}
+    _revocations.replace(tokens, users)
+
+
+def _load_session(token: str):
+    with _pool.reader() as conn:
         row = conn.execute(
-            "SELECT token, user_id, role, specialty, expires_at FROM sessions WHERE token = ?",
+            "SELECT token, user_id, role, specialty, expires_at, expires_epoch FROM sessions WHERE token = ?",
             (token,),
         ).fetchone()
-    finally:
-        conn.close()
     if not row:
+        _session_cache.set(token, False, ttl=INVALID_TOKEN_CACHE_TTL_SECONDS)
         raise HTTPException(status_code=401, detail="Invalid token")
-    try:
-        expires_at = datetime.fromisoformat(row["expires_at"].replace("Z", ""))
-    except ValueError:
-        raise HTTPException(status_code=401, detail="Invalid token")
-    if expires_at < datetime.utcnow():
-        conn = _get_db()
+    expires_at = row["expires_epoch"]
+    if expires_at is None:
         try:
-            conn.execute("DELETE FROM sessions WHERE token = ?", (token,))
-            conn.commit()
-        finally:
-            conn.close()
-        raise HTTPException(status_code=401, detail="Token expired")
-    return {
+            expires_at = _parse_timestamp(row["expires_at"])
+        except ValueError:
+            raise HTTPException(status_code=401, detail="Invalid token")
+    session = {
         "token": row["token"],
         "user_id": row["user_id"],
         "role": row["role"],
         "specialty": row["specialty"],
+        "expires_at": expires_at,
     }
+    _session_cache.set(token, session, group=row["user_id"])
+    return session
+
+
+@app.post("/api/logout")
+def logout(request: Request):
+    session = _require_session(request)
+    token = session["token"]
+    claims = _token_signer.verify(token) if _token_signer is not None else None
+    with _pool.writer() as conn:
+        if claims:
+            conn.execute(
+                "INSERT OR REPLACE INTO token_revocations (kind, subject, revoked_at, expires_at) "
+                "VALUES ('token', ?, ?, ?)",
+                (claims["jti"], int(time.time() * 1000), claims["exp"]),
+            )
+        else:
+            conn.execute("DELETE FROM sessions WHERE token = ?", (token,))
+    if claims:
+        _revocations.revoke_token(claims["jti"], claims["exp"])
+    _notify("session_token", token)
+    return {"status": "logged_out"}
 
 
 def _require_role(request: Request, role: str):
@@ -446,39 +1043,83 @@ def _require_role(request: Request, role: str):
     return session
 
 
-async def _broadcast(message: dict):
-    dead = []
-    for ws in _ws_clients:
-        try:
-            await ws.send_json(message)
-        except RuntimeError:
-            dead.append(ws)
-    for ws in dead:
-        if ws in _ws_clients:
-            _ws_clients.remove(ws)
+def _order_topics(order_id: str, table_id: str, lines):
+    topics = {"admin", "chef:*", f"table:{table_id}", f"order:{order_id}"}
+    for line in lines:
+        topics.add(f"chef:{line['category']}")
+        if line["assigned_to"]:
+            topics.add(f"assignee:{line['assigned_to']}")
+    return topics
+
+
+def _load_order_event(conn, order_id: str):
+    return _load_order_events(conn, [order_id]).get(order_id, (None, set()))
+
+
+def _load_order_events(conn, order_ids: list):
+    placeholders = ",".join(["?"] * len(order_ids))
+    rows = conn.execute(
+        "SELECT orders.order_id, user_id, table_id, status, assigned_to, orders.created_at, total, "
+        "payment_status, ratings.rating, change_seq, updated_at "
+        "FROM orders LEFT JOIN ratings ON ratings.order_id = orders.order_id "
+        f"WHERE orders.order_id IN ({placeholders})",
+        order_ids,
+    ).fetchall()
+    return {
+        order["order_id"]: (order, _order_topics(order["order_id"], order["table_id"], order["items"]))
+        for order in _load_page_orders(conn, rows, "", [])
+    }
+
+
+async def _broadcast(message: dict, topics):
+    await _bus.publish(message, topics)
+
+
+def _notify(kind: str, payload=None):
+    _apply_control(kind, payload)
+    _bus.notify(kind, payload)
+
+
+def _apply_control(kind: str, payload):
+    if kind == "menu":
+        _menu_cache.invalidate()
+    elif kind == "sessions":
+        _session_cache.invalidate_group(payload)
+    elif kind == "session_token":
+        _session_cache.pop(payload)
+    elif kind == "recommendations":
+        _recommendation_cache.invalidate_group(payload)
+    elif kind == "order":
+        _recommender.mark_dirty()
+        for rowid, items in payload["orders"]:
+            _cooccurrence.add_order(rowid, [item_id for item_id, _ in items])
+            for item_id, quantity in items:
+                _popularity.add(item_id, quantity, payload["at"])
+
+
+def _insert_user(conn, payload: RegisterRequest, password_hash: str):
+    exists = conn.execute(
+        "SELECT 1 FROM users WHERE user_id = ?",
+        (payload.user_id,),
+    ).fetchone()
+    if exists:
+        raise HTTPException(status_code=409, detail="User already exists")
+    conn.execute(
+        "INSERT INTO users (user_id, password, role, specialty) VALUES (?, ?, ?, ?)",
+        (payload.user_id, password_hash, payload.role, payload.specialty),
+    )
 
 
 @app.post("/api/register")
-def register(payload: RegisterRequest):
+async def register(payload: RegisterRequest):
     if not payload.user_id or not payload.password:
         raise HTTPException(status_code=400, detail="user_id and password required")
     if payload.role not in ("customer", "admin", "chef"):
         raise HTTPException(status_code=400, detail="role must be customer, admin, or chef")
-    conn = _get_db()
-    try:
-        exists = conn.execute(
-            "SELECT 1 FROM users WHERE user_id = ?",
-            (payload.user_id,),
-        ).fetchone()
-        if exists:
-            raise HTTPException(status_code=409, detail="User already exists")
-        conn.execute(
-            "INSERT INTO users (user_id, password, role, specialty) VALUES (?, ?, ?, ?)",
-            (payload.user_id, _hash_password(payload.password), payload.role, payload.specialty),
-        )
-        conn.commit()
-    finally:
-        conn.close()
+    if await _pool.read(_load_credentials, payload.user_id):
+        raise HTTPException(status_code=409, detail="User already exists")
+    password_hash = await _hash_password(payload.password)
+    await _pool.write(_insert_user, payload, password_hash)
     return {
         "status": "created",
         "user_id": payload.user_id,
@@ -490,11 +1131,8 @@ def register(payload: RegisterRequest):
 @app.get("/api/users")
 def list_users(request: Request):
     _require_role(request, "admin")
-    conn = _get_db()
-    try:
+    with _pool.reader() as conn:
         rows = conn.execute("SELECT user_id, role, specialty FROM users ORDER BY user_id").fetchall()
-    finally:
-        conn.close()
     return {
         "users": [
             {"user_id": row["user_id"], "role": row["role"], "specialty": row["specialty"]}
@@ -506,14 +1144,11 @@ def list_users(request: Request):
 @app.get("/api/users/{user_id}")
 def get_user(user_id: str, request: Request):
     _require_role(request, "admin")
-    conn = _get_db()
-    try:
+    with _pool.reader() as conn:
         row = conn.execute(
             "SELECT user_id, role, specialty FROM users WHERE user_id = ?",
             (user_id,),
         ).fetchone()
-    finally:
-        conn.close()
     if not row:
         raise HTTPException(status_code=404, detail="User not found")
     return {"user_id": row["user_id"], "role": row["role"], "specialty": row["specialty"]}
@@ -524,32 +1159,37 @@ def update_user(user_id: str, payload: UpdateUserRequest, request: Request):
     _require_role(request, "admin")
     if payload.role and payload.role not in ("customer", "admin", "chef"):
         raise HTTPException(status_code=400, detail="role must be customer, admin, or chef")
-    conn = _get_db()
-    try:
+    password_hash = _hash_password_blocking(payload.password) if payload.password is not None else None
+    with _pool.writer() as conn:
         row = conn.execute("SELECT user_id FROM users WHERE user_id = ?", (user_id,)).fetchone()
         if not row:
             raise HTTPException(status_code=404, detail="User not found")
-        if payload.password is not None:
-            conn.execute("UPDATE users SET password = ? WHERE user_id = ?", (_hash_password(payload.password), user_id))
+        if password_hash is not None:
+            conn.execute("UPDATE users SET password = ? WHERE user_id = ?", (password_hash, user_id))
         if payload.role is not None:
             conn.execute("UPDATE users SET role = ? WHERE user_id = ?", (payload.role, user_id))
         if payload.specialty is not None:
             conn.execute("UPDATE users SET specialty = ? WHERE user_id = ?", (payload.specialty, user_id))
-        conn.commit()
-    finally:
-        conn.close()
+        if payload.role is not None or payload.specialty is not None:
+            conn.execute(
+                "UPDATE sessions SET role = (SELECT role FROM users WHERE user_id = ?), "
+                "specialty = (SELECT specialty FROM users WHERE user_id = ?) WHERE user_id = ?",
+                (user_id, user_id, user_id),
+            )
+            _revoke_user_tokens(conn, user_id)
+    if payload.role is not None or payload.specialty is not None:
+        _notify("sessions", user_id)
     return {"status": "updated", "user_id": user_id}
 
 
 @app.delete("/api/users/{user_id}")
 def delete_user(user_id: str, request: Request):
     _require_role(request, "admin")
-    conn = _get_db()
-    try:
+    with _pool.writer() as conn:
         cur = conn.execute("DELETE FROM users WHERE user_id = ?", (user_id,))
-        conn.commit()
-    finally:
-        conn.close()
+        conn.execute("DELETE FROM sessions WHERE user_id = ?", (user_id,))
+        _revoke_user_tokens(conn, user_id)
+    _notify("sessions", user_id)
     if cur.rowcount == 0:
         raise HTTPException(status_code=404, detail="User not found")
     return {"status": "deleted", "user_id": user_id}
@@ -562,15 +1202,12 @@ def update_profile(user_id: str, payload: UpdateProfileRequest, request: Request
         raise HTTPException(status_code=403, detail="Cannot modify another user")
     if payload.password is None:
         raise HTTPException(status_code=400, detail="password required")
-    conn = _get_db()
-    try:
+    password_hash = _hash_password_blocking(payload.password)
+    with _pool.writer() as conn:
         row = conn.execute("SELECT user_id FROM users WHERE user_id = ?", (user_id,)).fetchone()
         if not row:
             raise HTTPException(status_code=404, detail="User not found")
-        conn.execute("UPDATE users SET password = ? WHERE user_id = ?", (_hash_password(payload.password), user_id))
-        conn.commit()
-    finally:
-        conn.close()
+        conn.execute("UPDATE users SET password = ? WHERE user_id = ?", (password_hash, user_id))
     return {"status": "updated", "user_id": user_id}
 
 
@@ -579,133 +1216,344 @@ def delete_profile(request: Request):
     session = _require_session(request)
     if session.get("role") != "customer":
         raise HTTPException(status_code=403, detail="Customers only")
-    conn = _get_db()
-    try:
+    with _pool.writer() as conn:
         conn.execute("DELETE FROM users WHERE user_id = ?", (session["user_id"],))
         conn.execute("DELETE FROM user_preferences WHERE user_id = ?", (session["user_id"],))
         conn.execute("DELETE FROM sessions WHERE user_id = ?", (session["user_id"],))
-        conn.commit()
-    finally:
-        conn.close()
+        conn.execute("DELETE FROM user_item_counts WHERE user_id = ?", (session["user_id"],))
+        conn.execute("DELETE FROM user_category_counts WHERE user_id = ?", (session["user_id"],))
+        _revoke_user_tokens(conn, session["user_id"])
+    _notify("sessions", session["user_id"])
+    _notify("recommendations", session["user_id"])
     return {"status": "deleted"}
 
 
-@app.post("/api/orders")
-async def create_order(payload: CreateOrderRequest, request: Request):
-    session = _require_session(request)
-    if session.get("role") != "customer":
-        raise HTTPException(status_code=403, detail="Only customers can create orders")
-    if not payload.items:
-        raise HTTPException(status_code=400, detail="items required")
-    order_id = f"ord-{int(datetime.utcnow().timestamp())}-{session['user_id']}"
-    menu_index = {item["id"]: item for item in _load_menu_from_db()}
-    items_payload = []
-    total = 0.0
-    for item in payload.items:
-        if item.item_id not in menu_index:
-            raise HTTPException(status_code=400, detail=f"Invalid item_id {item.item_id}")
-        menu_item = menu_index[item.item_id]
-        category = menu_item.get("category", "unknown").lower()
-        assigned_to = _auto_assign_chef(category)
-        line_total = float(menu_item.get("price", 0)) * item.quantity
-        total += line_total
-        items_payload.append(
+def _prepare_orders(batch: list, results: list):
+    menu_index = _menu_cache.get().index
+    accepted = []
+    for index, (session, payload) in enumerate(batch):
+        missing = next((item.item_id for item in payload.items if item.item_id not in menu_index), None)
+        invalid = next((item.item_id for item in payload.items if item.quantity < 1), None)
+        if missing is not None:
+            results[index] = HTTPException(status_code=400, detail=f"Invalid item_id {missing}")
+        elif invalid is not None:
+            results[index] = HTTPException(status_code=400, detail=f"Invalid quantity for {invalid}")
+        else:
+            accepted.append((index, session, payload))
+    categories = [
+        menu_index[item.item_id].get("category", "unknown").lower()
+        for _, _, payload in accepted
+        for item in payload.items
+    ]
+    assigned = iter(_assign_chefs(categories))
+    orders = []
+    for index, session, payload in accepted:
+        items_payload = []
+        total = 0.0
+        for item in payload.items:
+            menu_item = menu_index[item.item_id]
+            total += float(menu_item.get("price", 0)) * item.quantity
+            items_payload.append(
+                {
+                    "item_id": item.item_id,
+                    "quantity": item.quantity,
+                    "category": menu_item.get("category", "unknown").lower(),
+                    "name": menu_item.get("name"),
+                    "price": menu_item.get("price"),
+                    "assigned_to": next(assigned),
+                }
+            )
+        orders.append(
             {
-                "item_id": item.item_id,
-                "quantity": item.quantity,
-                "category": category,
-                "name": menu_item.get("name"),
-                "price": menu_item.get("price"),
-                "assigned_to": assigned_to,
+                "index": index,
+                "order_id": _ids.new("ord"),
+                "user_id": session["user_id"],
+                "table_id": payload.table_id,
+                "total": total,
+                "items": items_payload,
             }
         )
-    items_json = json.dumps(items_payload)
-    conn = _get_db()
-    try:
-        conn.execute(
-            "INSERT INTO orders (order_id, user_id, table_id, status, items_json, created_at, total, payment_status) "
-            "VALUES (?, ?, ?, ?, ?, ?, ?, ?)",
+    return orders
+
+
+def _write_orders(conn, orders: list, created_at: str):
+    if STRICT_STOCK:
+        if not conn.in_transaction:
+            conn.execute("BEGIN IMMEDIATE")
+        for order in orders:
+            order.pop("error", None)
+            short = _reserve_stock(conn, order["items"], created_at)
+            if short:
+                order["error"] = HTTPException(status_code=409, detail=f"Insufficient stock for {', '.join(short)}")
+        orders = [order for order in orders if "error" not in order]
+    else:
+        _adjust_inventory(conn, [item for order in orders for item in order["items"]], created_at)
+    if not orders:
+        return
+    conn.executemany(
+        "INSERT INTO orders (order_id, user_id, table_id, status, items_json, created_at, total, payment_status, "
+        f"change_seq, updated_at) VALUES (?, ?, ?, 'placed', '[]', ?, ?, 'unpaid', {NEXT_CHANGE_SEQ_SQL}, ?)",
+        [
+            (order["order_id"], order["user_id"], order["table_id"], created_at, order["total"], created_at)
+            for order in orders
+        ],
+    )
+    _insert_order_items(
+        conn,
+        [
             (
-                order_id,
-                session["user_id"],
-                payload.table_id,
+                order["order_id"],
+                line_no,
+                item["item_id"],
+                item["name"],
+                item["category"],
+                item["quantity"],
+                item["price"] or 0,
+                item["assigned_to"],
                 "placed",
-                items_json,
-                datetime.utcnow().isoformat() + "Z",
-                total,
-                "unpaid",
-            ),
-        )
-        conn.commit()
-    finally:
-        conn.close()
-    _adjust_inventory(items_payload)
-    await _broadcast(
-        {
-            "type": "order_created",
-            "order_id": order_id,
-            "table_id": payload.table_id,
-            "items": items_payload,
-        }
+            )
+            for order in orders
+            for line_no, item in enumerate(order["items"])
+        ],
+    )
+    _record_order_aggregates(conn, orders)
+    order_ids = [order["order_id"] for order in orders]
+    placeholders = ",".join(["?"] * len(order_ids))
+    rowids = dict(
+        conn.execute(f"SELECT order_id, rowid FROM orders WHERE order_id IN ({placeholders})", order_ids).fetchall()
     )
+    events = _load_order_events(conn, order_ids)
+    for order in orders:
+        order["rowid"] = rowids[order["order_id"]]
+        order["event"] = events[order["order_id"]]
+
+
+def _place_orders(batch: list):
+    results = [None] * len(batch)
+    started = time.perf_counter()
+    orders = _prepare_orders(batch, results)
+    _order_batcher.record("prepare", time.perf_counter() - started)
+    started = time.perf_counter()
+    created_at = datetime.utcnow().isoformat() + "Z"
+    try:
+        with _pool.writer() as conn:
+            _write_orders(conn, orders, created_at)
+    except sqlite3.IntegrityError:
+        for order in orders:
+            for _ in range(ID_RETRIES):
+                order["order_id"] = _ids.new("ord")
+                try:
+                    with _pool.writer() as conn:
+                        _write_orders(conn, [order], created_at)
+                    break
+                except sqlite3.IntegrityError:
+                    continue
+            else:
+                order["error"] = HTTPException(status_code=409, detail="Could not allocate an order id")
+    _order_batcher.record("write", time.perf_counter() - started)
+    for order in orders:
+        if "error" in order:
+            results[order["index"]] = order["error"]
+    placed = [order for order in orders if "error" not in order]
+    if placed:
+        _notify(
+            "order",
+            {
+                "orders": [
+                    (order["rowid"], [(item["item_id"], item["quantity"]) for item in order["items"]])
+                    for order in sorted(placed, key=lambda order: order["rowid"])
+                ],
+                "at": time.time(),
+            },
+        )
+    for user_id in dict.fromkeys(order["user_id"] for order in placed):
+        _notify("recommendations", user_id)
+    for order in placed:
+        results[order["index"]] = (order["order_id"], order["total"], *order["event"])
+    return results
+
+
+async def _ingest_orders(batch: list):
+    results = await _pool.run(_place_orders, batch)
+    started = time.perf_counter()
+    events = []
+    for result in results:
+        if isinstance(result, tuple):
+            order_id, _, order, topics = result
+            events.append(
+                ({"type": "order_created", "order_id": order_id, "table_id": order["table_id"], "order": order}, topics)
+            )
+    await _bus.publish_many(events)
+    _order_batcher.record("publish", time.perf_counter() - started)
+    return results
+
+
+@app.post("/api/orders")
+async def create_order(payload: CreateOrderRequest, request: Request):
+    session = await _pool.run(_require_session, request)
+    if session.get("role") != "customer":
+        raise HTTPException(status_code=403, detail="Only customers can create orders")
+    if not payload.items:
+        raise HTTPException(status_code=400, detail="items required")
+    order_id, total, _, _ = await _order_batcher.submit((session, payload))
     return {"order_id": order_id, "status": "placed", "total": total}
 
 
+def _encode_cursor(row):
+    return base64.urlsafe_b64encode(f"{row['created_at']}|{row['order_id']}".encode("utf-8")).decode("ascii")
+
+
+def _decode_cursor(cursor: str):
+    try:
+        created_at, order_id = base64.urlsafe_b64decode(cursor.encode("ascii")).decode("utf-8").split("|", 1)
+    except (ValueError, UnicodeError):
+        raise HTTPException(status_code=400, detail="Invalid cursor")
+    return created_at, order_id
+
+
 @app.get("/api/orders")
-def list_orders(request: Request):
+def list_orders(
+    request: Request,
+    status: str | None = None,
+    table_id: str | None = None,
+    assigned_to: str | None = None,
+    created_from: str | None = None,
+    created_to: str | None = None,
+    before: str | None = None,
+    after: str | None = None,
+    limit: int = ORDERS_PAGE_SIZE,
+):
     session = _require_session(request)
     if session.get("role") not in ("admin", "chef"):
         raise HTTPException(status_code=403, detail="Insufficient role")
-    specialties = _parse_specialties(session.get("specialty")) if session.get("role") == "chef" else None
-    conn = _get_db()
-    try:
+    if before and after:
+        raise HTTPException(status_code=400, detail="Use either before or after, not both")
+    limit = max(1, min(limit, ORDERS_PAGE_MAX))
+    if status is None and session.get("role") == "chef":
+        status = "open"
+    statuses = OPEN_ORDER_STATUSES if status == "open" else [part for part in (status or "").split(",") if part]
+    line_filter, line_params = _chef_line_filter(session)
+    where = []
+    params = []
+    if statuses and status != "all":
+        where.append(f"orders.status IN ({','.join(['?'] * len(statuses))})")
+        params.extend(statuses)
+    if table_id:
+        where.append("orders.table_id = ?")
+        params.append(table_id)
+    if created_from:
+        where.append("orders.created_at >= ?")
+        params.append(created_from)
+    if created_to:
+        where.append("orders.created_at < ?")
+        params.append(created_to)
+    if assigned_to:
+        where.append("orders.order_id IN (SELECT order_id FROM order_items WHERE assigned_to = ?)")
+        params.append(assigned_to)
+    if line_filter:
+        where.append(f"orders.order_id IN (SELECT order_id FROM order_items WHERE {line_filter})")
+        params.extend(line_params)
+    if before:
+        where.append("(orders.created_at, orders.order_id) < (?, ?)")
+        params.extend(_decode_cursor(before))
+    if after:
+        where.append("(orders.created_at, orders.order_id) > (?, ?)")
+        params.extend(_decode_cursor(after))
+    direction = "ASC" if after else "DESC"
+    with _pool.reader() as conn:
+        change_seq = conn.execute("SELECT COALESCE(MAX(change_seq), 0) FROM orders").fetchone()[0]
         rows = conn.execute(
-            "SELECT order_id, user_id, table_id, status, items_json, assigned_to, created_at, total, payment_status "
-            "FROM orders ORDER BY created_at DESC"
+            "SELECT orders.order_id, user_id, table_id, status, assigned_to, orders.created_at, total, "
+            "payment_status, ratings.rating, change_seq, updated_at "
+            "FROM orders LEFT JOIN ratings ON ratings.order_id = orders.order_id "
+            f"{'WHERE ' + ' AND '.join(where) if where else ''} "
+            f"ORDER BY orders.created_at {direction}, orders.order_id {direction} LIMIT ?",
+            (*params, limit + 1),
         ).fetchall()
-        rating_rows = conn.execute("SELECT order_id, rating FROM ratings").fetchall()
-    finally:
-        conn.close()
-    ratings = {row["order_id"]: row["rating"] for row in rating_rows}
-    orders = []
-    for row in rows:
-        items = json.loads(row["items_json"])
-        if specialties:
-            items = [
-                item
-                for item in items
-                if item.get("category") in specialties or item.get("assigned_to") == session.get("user_id")
-            ]
-            if not items:
-                continue
-        orders.append(
-            {
-                "order_id": row["order_id"],
-                "user_id": row["user_id"],
-                "table_id": row["table_id"],
-                "status": row["status"],
-                "items": items,
-                "assigned_to": row["assigned_to"],
-                "created_at": row["created_at"],
-                "total": row["total"] or 0,
-                "payment_status": row["payment_status"] or "unpaid",
-                "rating": ratings.get(row["order_id"]),
-            }
-        )
-    return {"orders": orders}
+        has_more = len(rows) > limit
+        rows = rows[:limit]
+        if after:
+            rows.reverse()
+        orders = _load_page_orders(conn, rows, line_filter, line_params)
+    return {
+        "orders": orders,
+        "next_cursor": _encode_cursor(rows[-1]) if rows and (has_more or after) else None,
+        "prev_cursor": _encode_cursor(rows[0]) if rows and (has_more or not after) else None,
+        "change_seq": change_seq,
+    }
+
+
+@app.get("/api/orders/changes")
+def list_order_changes(request: Request, since: int = 0, limit: int = ORDERS_PAGE_MAX):
+    session = _require_session(request)
+    if session.get("role") not in ("admin", "chef"):
+        raise HTTPException(status_code=403, detail="Insufficient role")
+    limit = max(1, min(limit, ORDERS_PAGE_MAX))
+    line_filter, line_params = _chef_line_filter(session)
+    where = "change_seq > ?"
+    if line_filter:
+        where += f" AND orders.order_id IN (SELECT order_id FROM order_items WHERE {line_filter})"
+    with _pool.reader() as conn:
+        rows = conn.execute(
+            "SELECT orders.order_id, user_id, table_id, status, assigned_to, orders.created_at, total, "
+            "payment_status, ratings.rating, change_seq, updated_at "
+            "FROM orders LEFT JOIN ratings ON ratings.order_id = orders.order_id "
+            f"WHERE {where} ORDER BY change_seq LIMIT ?",
+            (since, *line_params, limit + 1),
+        ).fetchall()
+        has_more = len(rows) > limit
+        rows = rows[:limit]
+        orders = _load_page_orders(conn, rows, line_filter, line_params)
+    return {"orders": orders, "since": rows[-1]["change_seq"] if rows else since, "has_more": has_more}
+
+
+def _chef_line_filter(session: dict):
+    specialties = _parse_specialties(session.get("specialty")) if session.get("role") == "chef" else None
+    if not specialties:
+        return "", []
+    placeholders = ",".join(["?"] * len(specialties))
+    return f"(category IN ({placeholders}) OR assigned_to = ?)", [*specialties, session.get("user_id")]
+
+
+def _load_page_orders(conn, rows, line_filter: str, line_params):
+    if not rows:
+        return []
+    placeholders = ",".join(["?"] * len(rows))
+    item_rows = conn.execute(
+        "SELECT order_id, item_id, quantity, category, name, price, assigned_to, status FROM order_items "
+        f"WHERE order_id IN ({placeholders}){' AND ' + line_filter if line_filter else ''} "
+        "ORDER BY order_id, line_no",
+        (*[row["order_id"] for row in rows], *line_params),
+    ).fetchall()
+    items_by_order = _group_order_items(item_rows)
+    return [_order_payload(row, items_by_order.get(row["order_id"], [])) for row in rows]
+
+
+def _order_payload(row, items):
+    return {
+        "order_id": row["order_id"],
+        "user_id": row["user_id"],
+        "table_id": row["table_id"],
+        "status": row["status"],
+        "items": items,
+        "assigned_to": row["assigned_to"],
+        "created_at": row["created_at"],
+        "total": row["total"] or 0,
+        "payment_status": row["payment_status"] or "unpaid",
+        "rating": row["rating"],
+        "change_seq": row["change_seq"],
+        "updated_at": row["updated_at"],
+    }
 
 
 @app.get("/api/preferences")
 def get_preferences(request: Request):
     session = _require_session(request)
-    conn = _get_db()
-    try:
+    with _pool.reader() as conn:
         row = conn.execute(
             "SELECT veg_only, favorite_category FROM user_preferences WHERE user_id = ?",
             (session["user_id"],),
         ).fetchone()
-    finally:
-        conn.close()
     if not row:
         return {"veg_only": False, "favorite_category": None}
     return {"veg_only": bool(row["veg_only"]), "favorite_category": row["favorite_category"]}
@@ -714,8 +1562,7 @@ def get_preferences(request: Request):
 @app.put("/api/preferences")
 def update_preferences(payload: PreferenceRequest, request: Request):
     session = _require_session(request)
-    conn = _get_db()
-    try:
+    with _pool.writer() as conn:
         conn.execute(
             "INSERT OR REPLACE INTO user_preferences (user_id, veg_only, favorite_category) VALUES (?, ?, ?)",
             (
@@ -724,114 +1571,90 @@ def update_preferences(payload: PreferenceRequest, request: Request):
                 payload.favorite_category,
             ),
         )
-        conn.commit()
-    finally:
-        conn.close()
+    _notify("recommendations", session["user_id"])
     return {"status": "updated"}
 
 
+def _cooccurrence_seeds(user_item_counts: dict, cart_ids: tuple):
+    if cart_ids:
+        return dict.fromkeys(cart_ids, 1)
+    if user_item_counts:
+        return user_item_counts
+    return {row["item_id"]: row["score"] for row in _popularity.trending(COOCCURRENCE_POPULAR_SEEDS)}
+
+
 @app.get("/api/recommendations")
-def recommendations(request: Request):
+def recommendations(request: Request, cart: str | None = None):
     session = _require_session(request)
-    items = _load_menu_from_db()
-    now = datetime.utcnow().hour
-    conn = _get_db()
-    try:
+    snapshot = _menu_cache.get()
+    hour = datetime.utcnow().hour
+    cart_ids = tuple(sorted({item_id for item_id in (cart or "").split(",") if item_id in snapshot.index}))
+    cache_key = (session["user_id"], meal_tag_for_hour(hour), snapshot.version, cart_ids)
+    cached = _recommendation_cache.get(cache_key)
+    if cached is not None:
+        return cached
+    engine = _recommender.engine(snapshot)
+    with _pool.reader() as conn:
         pref = conn.execute(
             "SELECT veg_only, favorite_category FROM user_preferences WHERE user_id = ?",
             (session["user_id"],),
         ).fetchone()
-        order_rows = conn.execute("SELECT order_id, user_id, items_json FROM orders").fetchall()
-        rating_rows = conn.execute("SELECT order_id, rating FROM ratings").fetchall()
-    finally:
-        conn.close()
+        user_item_counts = dict(
+            conn.execute(
+                "SELECT item_id, quantity FROM user_item_counts WHERE user_id = ?",
+                (session["user_id"],),
+            ).fetchall()
+        )
+        top_category_row = conn.execute(
+            "SELECT category FROM user_category_counts WHERE user_id = ? ORDER BY quantity DESC LIMIT 1",
+            (session["user_id"],),
+        ).fetchone()
     veg_only = bool(pref["veg_only"]) if pref else False
     favorite = pref["favorite_category"] if pref else None
-
-    popularity = {}
-    user_item_counts = {}
-    user_category_counts = {}
-    ratings = {row["order_id"]: row["rating"] for row in rating_rows}
-    item_rating_sum = {}
-    item_rating_count = {}
-    for row in order_rows:
-        items_in_order = json.loads(row["items_json"])
-        for item in items_in_order:
-            popularity[item["item_id"]] = popularity.get(item["item_id"], 0) + item["quantity"]
-            if row["user_id"] == session["user_id"]:
-                user_item_counts[item["item_id"]] = user_item_counts.get(item["item_id"], 0) + item["quantity"]
-                user_category_counts[item["category"]] = user_category_counts.get(item["category"], 0) + item["quantity"]
-            if row["order_id"] in ratings:
-                item_rating_sum[item["item_id"]] = item_rating_sum.get(item["item_id"], 0) + ratings[row["order_id"]]
-                item_rating_count[item["item_id"]] = item_rating_count.get(item["item_id"], 0) + 1
-
-    top_user_category = None
-    if user_category_counts:
-        top_user_category = sorted(user_category_counts.items(), key=lambda x: x[1], reverse=True)[0][0]
-
-    scored = []
-    for item in items:
-        if veg_only and "vegetarian" not in item["tags"]:
-            continue
-        score = popularity.get(item["id"], 0)
-        if item["id"] in user_item_counts:
-            score += user_item_counts[item["id"]] * 2
-        if top_user_category and item["category"] == top_user_category:
-            score += 3
-        if favorite and item["category"] == favorite:
-            score += 5
-        if item["id"] in item_rating_sum:
-            avg_rating = item_rating_sum[item["id"]] / item_rating_count[item["id"]]
-            score += avg_rating * 2
-        if now < 11 and "breakfast" in item["tags"]:
-            score += 3
-        if 11 <= now < 17 and "lunch" in item["tags"]:
-            score += 3
-        if now >= 17 and "dinner" in item["tags"]:
-            score += 3
-        scored.append((score, item))
-
-    scored.sort(key=lambda x: x[0], reverse=True)
-    top = [item for _, item in scored[:5]]
-    return {"items": top}
+    top_user_category = top_category_row[0] if top_category_row else None
+    boosts = _cooccurrence.boosts(_cooccurrence_seeds(user_item_counts, cart_ids), weight=COOCCURRENCE_BOOST_WEIGHT)
+    top = engine.top_k(5, user_item_counts, top_user_category, favorite, veg_only, hour, boosts)
+    result = {"items": top}
+    _recommendation_cache.set(cache_key, result, group=session["user_id"])
+    return result
+
+
+def _set_order_status(conn, order_id: str, payload: UpdateOrderStatusRequest, role: str):
+    cur = conn.execute(
+        f"UPDATE orders SET status = ?, change_seq = {NEXT_CHANGE_SEQ_SQL}, updated_at = ? WHERE order_id = ?",
+        (payload.status, datetime.utcnow().isoformat() + "Z", order_id),
+    )
+    if cur.rowcount == 0:
+        raise HTTPException(status_code=404, detail="Order not found")
+    if payload.assigned_to is not None and role == "admin":
+        conn.execute(
+            "UPDATE order_items SET status = ?, assigned_to = ? WHERE order_id = ?",
+            (payload.status, payload.assigned_to, order_id),
+        )
+    else:
+        conn.execute("UPDATE order_items SET status = ? WHERE order_id = ?", (payload.status, order_id))
+    return _load_order_event(conn, order_id)
 
 
 @app.put("/api/orders/{order_id}")
 async def update_order(order_id: str, payload: UpdateOrderStatusRequest, request: Request):
-    session = _require_session(request)
+    session = await _pool.run(_require_session, request)
     if session.get("role") not in ("admin", "chef"):
         raise HTTPException(status_code=403, detail="Insufficient role")
     if payload.status not in ("placed", "preparing", "ready", "served"):
         raise HTTPException(status_code=400, detail="Invalid status")
-    conn = _get_db()
-    try:
-        row = conn.execute(
-            "SELECT order_id, items_json FROM orders WHERE order_id = ?",
-            (order_id,),
-        ).fetchone()
-        if not row:
-            raise HTTPException(status_code=404, detail="Order not found")
-        if payload.assigned_to is not None and session.get("role") == "admin":
-            items = json.loads(row["items_json"])
-            for item in items:
-                item["assigned_to"] = payload.assigned_to
-            conn.execute(
-                "UPDATE orders SET items_json = ? WHERE order_id = ?",
-                (json.dumps(items), order_id),
-            )
-        conn.execute("UPDATE orders SET status = ? WHERE order_id = ?", (payload.status, order_id))
-        conn.commit()
-    finally:
-        conn.close()
+    order, topics = await _pool.write(_set_order_status, order_id, payload, session.get("role"))
     await _broadcast(
         {
             "type": "order_status",
             "order_id": order_id,
             "status": payload.status,
             "assigned_to": payload.assigned_to,
-        }
+            "order": order,
+        },
+        topics,
     )
-    return {"status": "updated", "order_id": order_id}
+    return {"status": "updated", "order_id": order_id, "order": order}
 
 
 @app.get("/api/orders/mine")
@@ -839,17 +1662,21 @@ def list_my_orders(request: Request):
     session = _require_session(request)
     if session.get("role") != "customer":
         raise HTTPException(status_code=403, detail="Customers only")
-    conn = _get_db()
-    try:
+    with _pool.reader() as conn:
         rows = conn.execute(
-            "SELECT order_id, table_id, status, items_json, created_at, total, payment_status "
-            "FROM orders WHERE user_id = ? ORDER BY created_at DESC",
+            "SELECT orders.order_id, table_id, status, orders.created_at, total, payment_status, ratings.rating "
+            "FROM orders LEFT JOIN ratings ON ratings.order_id = orders.order_id "
+            "WHERE user_id = ? ORDER BY orders.created_at DESC",
             (session["user_id"],),
         ).fetchall()
-        rating_rows = conn.execute("SELECT order_id, rating FROM ratings").fetchall()
-    finally:
-        conn.close()
-    ratings = {row["order_id"]: row["rating"] for row in rating_rows}
+        item_rows = conn.execute(
+            "SELECT order_items.order_id, item_id, quantity, category, name, price, "
+            "order_items.assigned_to, order_items.status FROM order_items "
+            "JOIN orders ON orders.order_id = order_items.order_id "
+            "WHERE orders.user_id = ? ORDER BY order_items.order_id, line_no",
+            (session["user_id"],),
+        ).fetchall()
+    items_by_order = _group_order_items(item_rows)
     orders = []
     for row in rows:
         orders.append(
@@ -857,86 +1684,104 @@ def list_my_orders(request: Request):
                 "order_id": row["order_id"],
                 "table_id": row["table_id"],
                 "status": row["status"],
-                "items": json.loads(row["items_json"]),
+                "items": items_by_order.get(row["order_id"], []),
                 "created_at": row["created_at"],
                 "total": row["total"] or 0,
                 "payment_status": row["payment_status"] or "unpaid",
-                "rating": ratings.get(row["order_id"]),
+                "rating": row["rating"],
             }
         )
     return {"orders": orders}
 
 
+def _record_payment(conn, order_id: str, method: str, user_id: str):
+    row = conn.execute(
+        "SELECT order_id, user_id, total, payment_status FROM orders WHERE order_id = ?",
+        (order_id,),
+    ).fetchone()
+    if not row or row["user_id"] != user_id:
+        raise HTTPException(status_code=404, detail="Order not found")
+    if row["payment_status"] == "paid":
+        raise HTTPException(status_code=409, detail="Already paid")
+    for _ in range(ID_RETRIES):
+        try:
+            conn.execute(
+                "INSERT INTO payments (payment_id, order_id, amount, method, status, created_at) "
+                "VALUES (?, ?, ?, ?, ?, ?)",
+                (_ids.new("pay"), order_id, row["total"], method, "paid", datetime.utcnow().isoformat() + "Z"),
+            )
+            break
+        except sqlite3.IntegrityError:
+            continue
+    else:
+        raise HTTPException(status_code=409, detail="Could not allocate a payment id")
+    conn.execute(
+        f"UPDATE orders SET payment_status = ?, change_seq = {NEXT_CHANGE_SEQ_SQL}, updated_at = ? WHERE order_id = ?",
+        ("paid", datetime.utcnow().isoformat() + "Z", order_id),
+    )
+    return _load_order_event(conn, order_id)
+
+
 @app.post("/api/orders/{order_id}/pay")
 async def pay_order(order_id: str, payload: PaymentRequest, request: Request):
-    session = _require_session(request)
+    session = await _pool.run(_require_session, request)
     if session.get("role") != "customer":
         raise HTTPException(status_code=403, detail="Customers only")
     if payload.method not in ("card", "cash", "upi"):
         raise HTTPException(status_code=400, detail="Invalid payment method")
-    conn = _get_db()
-    try:
-        row = conn.execute(
-            "SELECT order_id, user_id, total, payment_status FROM orders WHERE order_id = ?",
-            (order_id,),
-        ).fetchone()
-        if not row or row["user_id"] != session["user_id"]:
-            raise HTTPException(status_code=404, detail="Order not found")
-        if row["payment_status"] == "paid":
-            raise HTTPException(status_code=409, detail="Already paid")
-        payment_id = f"pay-{int(datetime.utcnow().timestamp())}-{order_id}"
-        conn.execute(
-            "INSERT INTO payments (payment_id, order_id, amount, method, status, created_at) "
-            "VALUES (?, ?, ?, ?, ?, ?)",
-            (payment_id, order_id, row["total"], payload.method, "paid", datetime.utcnow().isoformat() + "Z"),
-        )
-        conn.execute("UPDATE orders SET payment_status = ? WHERE order_id = ?", ("paid", order_id))
-        conn.commit()
-    finally:
-        conn.close()
-    await _broadcast({"type": "payment", "order_id": order_id, "status": "paid"})
+    order, topics = await _pool.write(_record_payment, order_id, payload.method, session["user_id"])
+    await _broadcast({"type": "payment", "order_id": order_id, "status": "paid", "order": order}, topics)
     return {"status": "paid", "order_id": order_id}
 
 
+def _record_rating(conn, order_id: str, payload: RatingRequest, user_id: str):
+    row = conn.execute(
+        "SELECT order_id, user_id, status FROM orders WHERE order_id = ?",
+        (order_id,),
+    ).fetchone()
+    if not row or row["user_id"] != user_id:
+        raise HTTPException(status_code=404, detail="Order not found")
+    if row["status"] != "served":
+        raise HTTPException(status_code=400, detail="Order not served yet")
+    previous = conn.execute("SELECT rating FROM ratings WHERE order_id = ?", (order_id,)).fetchone()
+    rated_at = datetime.utcnow().isoformat() + "Z"
+    conn.execute(
+        "INSERT OR REPLACE INTO ratings (order_id, rating, comment, created_at) VALUES (?, ?, ?, ?)",
+        (order_id, payload.rating, payload.comment, rated_at),
+    )
+    conn.execute(
+        f"UPDATE orders SET change_seq = {NEXT_CHANGE_SEQ_SQL}, updated_at = ? WHERE order_id = ?",
+        (rated_at, order_id),
+    )
+    if previous:
+        _record_rating_aggregates(conn, order_id, payload.rating - previous["rating"], 0)
+    else:
+        _record_rating_aggregates(conn, order_id, payload.rating, 1)
+    return _load_order_event(conn, order_id)
+
+
 @app.post("/api/orders/{order_id}/rate")
 async def rate_order(order_id: str, payload: RatingRequest, request: Request):
-    session = _require_session(request)
+    session = await _pool.run(_require_session, request)
     if session.get("role") != "customer":
         raise HTTPException(status_code=403, detail="Customers only")
     if payload.rating < 1 or payload.rating > 5:
         raise HTTPException(status_code=400, detail="Rating must be 1-5")
-    conn = _get_db()
-    try:
-        row = conn.execute(
-            "SELECT order_id, user_id, status FROM orders WHERE order_id = ?",
-            (order_id,),
-        ).fetchone()
-        if not row or row["user_id"] != session["user_id"]:
-            raise HTTPException(status_code=404, detail="Order not found")
-        if row["status"] != "served":
-            raise HTTPException(status_code=400, detail="Order not served yet")
-        conn.execute(
-            "INSERT OR REPLACE INTO ratings (order_id, rating, comment, created_at) VALUES (?, ?, ?, ?)",
-            (order_id, payload.rating, payload.comment, datetime.utcnow().isoformat() + "Z"),
-        )
-        conn.commit()
-    finally:
-        conn.close()
-    await _broadcast({"type": "rating", "order_id": order_id, "rating": payload.rating})
+    order, topics = await _pool.write(_record_rating, order_id, payload, session["user_id"])
+    _recommender.mark_dirty()
+    await _pool.run(_notify, "recommendations", session["user_id"])
+    await _broadcast({"type": "rating", "order_id": order_id, "rating": payload.rating, "order": order}, topics)
     return {"status": "rated", "order_id": order_id}
 
 
 @app.get("/api/billing")
 def billing(request: Request):
     _require_role(request, "admin")
-    conn = _get_db()
-    try:
+    with _pool.reader() as conn:
         rows = conn.execute(
             "SELECT payment_id, order_id, amount, method, status, created_at FROM payments "
             "ORDER BY created_at DESC"
         ).fetchall()
-    finally:
-        conn.close()
     payments = [
         {
             "payment_id": row["payment_id"],
@@ -955,15 +1800,12 @@ def billing(request: Request):
 @app.get("/api/inventory")
 def inventory(request: Request):
     _require_role(request, "admin")
-    conn = _get_db()
-    try:
+    with _pool.reader() as conn:
         rows = conn.execute(
             "SELECT inventory.item_id, inventory.stock, inventory.updated_at, menu_items.name "
             "FROM inventory LEFT JOIN menu_items ON inventory.item_id = menu_items.item_id "
             "ORDER BY menu_items.name"
         ).fetchall()
-    finally:
-        conn.close()
     return {
         "items": [
             {
@@ -982,15 +1824,11 @@ def update_inventory(item_id: str, payload: InventoryUpdateRequest, request: Req
     _require_role(request, "admin")
     if payload.stock < 0:
         raise HTTPException(status_code=400, detail="stock must be >= 0")
-    conn = _get_db()
-    try:
+    with _pool.writer() as conn:
         conn.execute(
             "INSERT OR REPLACE INTO inventory (item_id, stock, updated_at) VALUES (?, ?, ?)",
             (item_id, payload.stock, datetime.utcnow().isoformat() + "Z"),
         )
-        conn.commit()
-    finally:
-        conn.close()
     return {"status": "updated", "item_id": item_id}
 
 
@@ -998,11 +1836,7 @@ def update_inventory(item_id: str, payload: InventoryUpdateRequest, request: Req
 def client_ping(payload: PingRequest):
     if not payload.device_id or not payload.table_id:
         raise HTTPException(status_code=400, detail="device_id, table_id required")
-    _clients[payload.device_id] = {
-        "device_id": payload.device_id,
-        "table_id": payload.table_id,
-        "last_seen": datetime.utcnow().isoformat() + "Z",
-    }
+    _bus.touch_client(payload.device_id, payload.table_id, datetime.utcnow().isoformat() + "Z")
     return {"status": "ok"}
 
 
@@ -1011,7 +1845,7 @@ def clients(request: Request):
     _require_role(request, "admin")
     cutoff = datetime.utcnow() - timedelta(seconds=30)
     online = []
-    for info in _clients.values():
+    for info in _bus.clients():
         try:
             last_seen = datetime.fromisoformat(info["last_seen"].replace("Z", ""))
         except ValueError:
@@ -1024,8 +1858,7 @@ def clients(request: Request):
 @app.delete("/api/clients/{device_id}")
 def remove_client(device_id: str, request: Request):
     _require_role(request, "admin")
-    if device_id in _clients:
-        del _clients[device_id]
+    if _bus.remove_client(device_id):
         return {"status": "removed", "device_id": device_id}
     raise HTTPException(status_code=404, detail="Device not found")
 
@@ -1033,27 +1866,76 @@ def remove_client(device_id: str, request: Request):
 @app.post("/api/clients/clear")
 def clear_clients(request: Request):
     _require_role(request, "admin")
-    _clients.clear()
+    _bus.clear_clients()
     return {"status": "cleared"}
 
 
+def _etag_matches(request: Request, etag: str):
+    header = request.headers.get("if-none-match")
+    if not header:
+        return False
+    candidates = [part.strip() for part in header.split(",")]
+    return "*" in candidates or etag in candidates or f"W/{etag}" in candidates
+
+
+def _menu_response(request: Request):
+    snapshot = _menu_cache.get()
+    use_gzip = "gzip" in request.headers.get("accept-encoding", "").lower()
+    etag = snapshot.gzip_etag if use_gzip else snapshot.etag
+    headers = {"ETag": etag, "Cache-Control": "no-cache", "Vary": "Accept-Encoding"}
+    if _etag_matches(request, etag):
+        return Response(status_code=304, headers=headers)
+    if use_gzip:
+        headers["Content-Encoding"] = "gzip"
+        return Response(content=snapshot.gzip_body, media_type="application/json", headers=headers)
+    return Response(content=snapshot.body, media_type="application/json", headers=headers)
+
+
+@app.get("/api/trending")
+def trending(request: Request, limit: int = 10):
+    _require_role(request, "admin")
+    rows = _popularity.trending(max(1, min(limit, 50)))
+    index = _menu_cache.get().index
+    with _pool.reader() as conn:
+        all_time = dict(conn.execute("SELECT item_id, quantity FROM item_popularity").fetchall())
+    for row in rows:
+        row["name"] = index.get(row["item_id"], {}).get("name")
+        row["all_time"] = all_time.get(row["item_id"], 0)
+    return {"items": rows}
+
+
 @app.get("/api/menu")
 def menu(request: Request):
     _require_session(request)
-    return {"items": _load_menu_from_db()}
+    return _menu_response(request)
 
 
 @app.get("/api/menu/admin")
 def menu_admin(request: Request):
     _require_role(request, "admin")
-    return {"items": _load_menu_from_db()}
+    return _menu_response(request)
+
+
+@app.get("/api/menu/{item_id}/related")
+def related_menu_items(item_id: str, request: Request, limit: int = 5):
+    _require_session(request)
+    index = _menu_cache.get().index
+    if item_id not in index:
+        raise HTTPException(status_code=404, detail="Item not found")
+    limit = max(1, min(limit, 20))
+    related = []
+    for other_id, count in _cooccurrence.related(item_id, limit * 2):
+        if other_id in index:
+            related.append({**index[other_id], "together_count": count})
+        if len(related) >= limit:
+            break
+    return {"item_id": item_id, "items": related}
 
 
 @app.post("/api/menu")
 def create_menu_item(payload: MenuItemCreateRequest, request: Request):
     _require_role(request, "admin")
-    conn = _get_db()
-    try:
+    with _pool.writer() as conn:
         exists = conn.execute(
             "SELECT 1 FROM menu_items WHERE item_id = ?",
             (payload.item_id,),
@@ -1068,17 +1950,14 @@ def create_menu_item(payload: MenuItemCreateRequest, request: Request):
             "INSERT OR IGNORE INTO inventory (item_id, stock, updated_at) VALUES (?, ?, ?)",
             (payload.item_id, 0, datetime.utcnow().isoformat() + "Z"),
         )
-        conn.commit()
-    finally:
-        conn.close()
+    _notify("menu")
     return {"status": "created", "item_id": payload.item_id}
 
 
 @app.put("/api/menu/{item_id}")
 def update_menu_item(item_id: str, payload: MenuItemUpdateRequest, request: Request):
     _require_role(request, "admin")
-    conn = _get_db()
-    try:
+    with _pool.writer() as conn:
         row = conn.execute("SELECT item_id FROM menu_items WHERE item_id = ?", (item_id,)).fetchone()
         if not row:
             raise HTTPException(status_code=404, detail="Item not found")
@@ -1093,22 +1972,17 @@ def update_menu_item(item_id: str, payload: MenuItemUpdateRequest, request: Requ
             )
         if payload.category is not None:
             conn.execute("UPDATE menu_items SET category = ? WHERE item_id = ?", (payload.category, item_id))
-        conn.commit()
-    finally:
-        conn.close()
+    _notify("menu")
     return {"status": "updated", "item_id": item_id}
 
 
 @app.delete("/api/menu/{item_id}")
 def delete_menu_item(item_id: str, request: Request):
     _require_role(request, "admin")
-    conn = _get_db()
-    try:
+    with _pool.writer() as conn:
         cur = conn.execute("DELETE FROM menu_items WHERE item_id = ?", (item_id,))
         conn.execute("DELETE FROM inventory WHERE item_id = ?", (item_id,))
-        conn.commit()
-    finally:
-        conn.close()
     if cur.rowcount == 0:
         raise HTTPException(status_code=404, detail="Item not found")
+    _notify("menu")
     return {"status": "deleted", "item_id": item_id}
@@ -0,0 +1,119 @@
+from concurrent.futures import ThreadPoolExecutor
+import asyncio
+import hashlib
+import hmac
+import os
+import threading
+import time
+
+
+SCHEME = "pbkdf2_sha256"
+LEGACY_ITERATIONS = 100000
+
+
+class HashingOverloaded(RuntimeError):
+    pass
+
+
+def hash_password(password: str, iterations: int = LEGACY_ITERATIONS):
+    salt = os.urandom(16).hex()
+    digest = hashlib.pbkdf2_hmac("sha256", password.encode("utf-8"), salt.encode("utf-8"), iterations).hex()
+    return f"{SCHEME}${iterations}${salt}${digest}"
+
+
+def _parse(stored: str):
+    parts = stored.split("$")
+    if len(parts) == 4 and parts[0] == SCHEME:
+        return int(parts[1]), parts[2], parts[3]
+    salt, digest = stored.split("$", 1)
+    return LEGACY_ITERATIONS, salt, digest
+
+
+def verify_password(stored: str, password: str):
+    if "$" not in stored:
+        return hmac.compare_digest(stored.encode("utf-8"), password.encode("utf-8"))
+    iterations, salt, digest = _parse(stored)
+    check = hashlib.pbkdf2_hmac("sha256", password.encode("utf-8"), salt.encode("utf-8"), iterations).hex()
+    return hmac.compare_digest(check, digest)
+
+
+def needs_rehash(stored: str, iterations: int):
+    if "$" not in stored or not stored.startswith(f"{SCHEME}$"):
+        return True
+    return _parse(stored)[0] != iterations
+
+
+class HashingPool:
+    def __init__(self, iterations: int = LEGACY_ITERATIONS, max_workers: int = 2, max_pending: int = 32):
+        self.iterations = iterations
+        self.max_workers = max_workers
+        self.max_pending = max_pending
+        self._executor = None
+        self._lock = threading.Lock()
+        self._pending = 0
+        self._completed = 0
+        self._rejected = 0
+        self._wait_total = 0.0
+        self._wait_max = 0.0
+        self._run_total = 0.0
+
+    def _get_executor(self):
+        with self._lock:
+            if self._executor is None:
+                self._executor = ThreadPoolExecutor(max_workers=self.max_workers, thread_name_prefix="kdf")
+            return self._executor
+
+    def _timed(self, fn, args, submitted: float):
+        started = time.perf_counter()
+        try:
+            return fn(*args)
+        finally:
+            finished = time.perf_counter()
+            with self._lock:
+                self._pending -= 1
+                self._completed += 1
+                self._wait_total += started - submitted
+                self._wait_max = max(self._wait_max, started - submitted)
+                self._run_total += finished - started
+
+    def submit(self, fn, *args):
+        executor = self._get_executor()
+        with self._lock:
+            if self._pending >= self.max_pending:
+                self._rejected += 1
+                raise HashingOverloaded("Password hashing queue is full")
+            self._pending += 1
+        return executor.submit(self._timed, fn, args, time.perf_counter())
+
+    async def hash(self, password: str):
+        return await asyncio.wrap_future(self.submit(hash_password, password, self.iterations))
+
+    async def verify(self, stored: str, password: str):
+        return await asyncio.wrap_future(self.submit(verify_password, stored, password))
+
+    def hash_blocking(self, password: str):
+        return self.submit(hash_password, password, self.iterations).result()
+
+    def needs_rehash(self, stored: str):
+        return needs_rehash(stored, self.iterations)
+
+    def stats(self):
+        with self._lock:
+            completed = self._completed
+            return {
+                "iterations": self.iterations,
+                "workers": self.max_workers,
+                "max_pending": self.max_pending,
+                "pending": self._pending,
+                "completed": completed,
+                "rejected": self._rejected,
+                "queue_wait_ms_avg": (self._wait_total / completed * 1000) if completed else 0.0,
+                "queue_wait_ms_max": self._wait_max * 1000,
+                "hash_ms_avg": (self._run_total / completed * 1000) if completed else 0.0,
+            }
+
+    def close(self):
+        with self._lock:
+            executor, self._executor = self._executor, None
+        if executor is not None:
+            executor.shutdown(wait=True)
@@ -0,0 +1,130 @@
+import threading
+import time
+
+import numpy as np
+
+
+TAG_VEGETARIAN = 1
+TAG_BREAKFAST = 2
+TAG_LUNCH = 4
+TAG_DINNER = 8
+TAG_BITS = {
+    "vegetarian": TAG_VEGETARIAN,
+    "breakfast": TAG_BREAKFAST,
+    "lunch": TAG_LUNCH,
+    "dinner": TAG_DINNER,
+}
+
+
+def meal_tag_for_hour(hour: int):
+    if hour < 11:
+        return TAG_BREAKFAST
+    if hour < 17:
+        return TAG_LUNCH
+    return TAG_DINNER
+
+
+class ScoringEngine:
+    def __init__(self, version: int, items: list):
+        self.version = version
+        self.items = items
+        self.positions = {item["id"]: index for index, item in enumerate(items)}
+        self.category_index = {}
+        codes = []
+        masks = []
+        for item in items:
+            codes.append(self.category_index.setdefault(item["category"], len(self.category_index)))
+            mask = 0
+            for tag in item["tags"]:
+                mask |= TAG_BITS.get(tag, 0)
+            masks.append(mask)
+        self.category_codes = np.array(codes, dtype=np.int32)
+        self.tag_masks = np.array(masks, dtype=np.uint8)
+        self.popularity = np.zeros(len(items), dtype=np.float64)
+        self.rating_avg = np.zeros(len(items), dtype=np.float64)
+
+    def align(self, values: dict):
+        aligned = np.zeros(len(self.items), dtype=np.float64)
+        for item_id, value in values.items():
+            position = self.positions.get(item_id)
+            if position is not None:
+                aligned[position] = value
+        return aligned
+
+    def load_aggregates(self, popularity: dict, rating_sums: dict, rating_counts: dict):
+        sums = self.align(rating_sums)
+        counts = self.align(rating_counts)
+        self.popularity = self.align(popularity)
+        self.rating_avg = np.divide(sums, counts, out=np.zeros_like(sums), where=counts > 0)
+
+    def scores(
+        self,
+        user_item_counts: dict,
+        top_category: str | None,
+        favorite: str | None,
+        hour: int,
+        boosts: dict | None = None,
+    ):
+        scores = self.popularity + self.rating_avg * 2
+        if user_item_counts:
+            scores += self.align(user_item_counts) * 2
+        if boosts:
+            scores += self.align(boosts)
+        if top_category in self.category_index:
+            scores += (self.category_codes == self.category_index[top_category]) * 3
+        if favorite in self.category_index:
+            scores += (self.category_codes == self.category_index[favorite]) * 5
+        scores += ((self.tag_masks & meal_tag_for_hour(hour)) != 0) * 3
+        return scores
+
+    def top_k(
+        self,
+        k: int,
+        user_item_counts: dict,
+        top_category: str | None,
+        favorite: str | None,
+        veg_only: bool,
+        hour: int,
+        boosts: dict | None = None,
+    ):
+        scores = self.scores(user_item_counts, top_category, favorite, hour, boosts)
+        if veg_only:
+            candidates = np.flatnonzero(self.tag_masks & TAG_VEGETARIAN)
+        else:
+            candidates = np.arange(len(self.items))
+        candidate_scores = scores[candidates]
+        if len(candidates) > k:
+            kth = candidate_scores[np.argpartition(-candidate_scores, k - 1)[k - 1]]
+            above = np.flatnonzero(candidate_scores > kth)
+            ties = np.flatnonzero(candidate_scores == kth)[: k - len(above)]
+            selected = np.concatenate((above, ties))
+        else:
+            selected = np.arange(len(candidates))
+        ordered = selected[np.lexsort((selected, -candidate_scores[selected]))]
+        return [self.items[position] for position in candidates[ordered]]
+
+
+class Recommender:
+    def __init__(self, aggregate_loader, refresh_seconds: float = 5.0):
+        self._aggregate_loader = aggregate_loader
+        self.refresh_seconds = refresh_seconds
+        self._lock = threading.Lock()
+        self._engine = None
+        self._loaded_at = 0.0
+        self._dirty = True
+
+    def mark_dirty(self):
+        self._dirty = True
+
+    def engine(self, snapshot):
+        with self._lock:
+            engine = self._engine
+            if engine is None or engine.version != snapshot.version:
+                engine = ScoringEngine(snapshot.version, snapshot.items)
+                self._dirty = True
+            if self._dirty or time.monotonic() - self._loaded_at > self.refresh_seconds:
+                self._dirty = False
+                engine.load_aggregates(*self._aggregate_loader())
+                self._loaded_at = time.monotonic()
+            self._engine = engine
+            return engine
@@ -0,0 +1,108 @@
+import base64
+import hashlib
+import hmac
+import json
+import os
+import threading
+import time
+
+
+TOKEN_PREFIX = "st1."
+
+
+def _b64encode(data: bytes):
+    return base64.urlsafe_b64encode(data).rstrip(b"=").decode("ascii")
+
+
+def _b64decode(data: str):
+    return base64.urlsafe_b64decode(data + "=" * (-len(data) % 4))
+
+
+def parse_keys(value: str | None):
+    keys = {}
+    for part in (value or "").split(","):
+        part = part.strip()
+        if not part or ":" not in part:
+            continue
+        kid, secret = part.split(":", 1)
+        keys[kid.strip()] = secret.strip().encode("utf-8")
+    return keys
+
+
+class TokenSigner:
+    def __init__(self, keys: dict, active_kid: str | None = None):
+        self.keys = {}
+        self.active_kid = None
+        if keys:
+            self.set_keys(keys, active_kid)
+
+    def set_keys(self, keys: dict, active_kid: str | None = None):
+        if not keys:
+            raise ValueError("At least one signing key is required")
+        self.keys = dict(keys)
+        self.active_kid = active_kid or next(iter(self.keys))
+
+    def _sign(self, kid: str, body: str):
+        return hmac.new(self.keys[kid], (TOKEN_PREFIX + body).encode("ascii"), hashlib.sha256).digest()
+
+    def issue(self, user_id: str, role: str, specialty: str | None, ttl_seconds: int):
+        if self.active_kid is None:
+            raise RuntimeError("Token signing keys are not loaded")
+        issued_at = int(time.time() * 1000)
+        claims = {
+            "u": user_id,
+            "r": role,
+            "s": specialty,
+            "iat": issued_at,
+            "exp": issued_at // 1000 + ttl_seconds,
+            "kid": self.active_kid,
+            "jti": _b64encode(os.urandom(9)),
+        }
+        body = _b64encode(json.dumps(claims, separators=(",", ":")).encode("utf-8"))
+        token = f"{TOKEN_PREFIX}{body}.{_b64encode(self._sign(self.active_kid, body))}"
+        return token, claims
+
+    def verify(self, token: str):
+        if not token.startswith(TOKEN_PREFIX):
+            return None
+        try:
+            body, signature = token[len(TOKEN_PREFIX):].split(".", 1)
+            claims = json.loads(_b64decode(body))
+            kid = claims["kid"]
+            if kid not in self.keys:
+                return None
+            if not hmac.compare_digest(self._sign(kid, body), _b64decode(signature)):
+                return None
+        except (ValueError, KeyError, TypeError):
+            return None
+        return claims
+
+
+class RevocationList:
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._tokens = {}
+        self._users = {}
+
+    def revoke_token(self, jti: str, expires_at: float):
+        with self._lock:
+            self._tokens[jti] = expires_at
+
+    def revoke_user(self, user_id: str, revoked_at_ms: int):
+        with self._lock:
+            self._users[user_id] = max(revoked_at_ms, self._users.get(user_id, 0))
+
+    def is_revoked(self, claims: dict):
+        with self._lock:
+            if claims["jti"] in self._tokens:
+                return True
+            return claims["iat"] <= self._users.get(claims["u"], -1)
+
+    def replace(self, tokens: dict, users: dict):
+        with self._lock:
+            self._tokens = dict(tokens)
+            self._users = dict(users)
+
+    def stats(self):
+        with self._lock:
+            return {"tokens": len(self._tokens), "users": len(self._users)}
@@ -0,0 +1,132 @@
+from collections import deque
+import math
+import threading
+import time
+
+
+SECONDS_PER_DAY = 86400
+
+
+class PopularityTracker:
+    def __init__(
+        self,
+        half_life_seconds: float = 3 * SECONDS_PER_DAY,
+        hourly_half_life_seconds: float = 14 * SECONDS_PER_DAY,
+        window_days: int = 7,
+        prune_below: float = 0.01,
+        hourly_weight: float = 0.3,
+    ):
+        if not 0 <= hourly_weight <= 1:
+            raise ValueError("hourly_weight must be between 0 and 1")
+        self.half_life_seconds = half_life_seconds
+        self.hourly_half_life_seconds = hourly_half_life_seconds
+        self.hourly_weight = hourly_weight
+        self.window_days = window_days
+        self.prune_below = prune_below
+        self._lock = threading.Lock()
+        self._decayed = {}
+        self._hourly = {}
+        self._days = deque(maxlen=window_days)
+        self._events = 0
+
+    @staticmethod
+    def _decay(value: float, elapsed: float, half_life: float):
+        if elapsed <= 0:
+            return value
+        return value * math.exp(-elapsed * math.log(2) / half_life)
+
+    def _value_at(self, entry, now: float, half_life: float):
+        value, updated_at = entry
+        return self._decay(value, now - updated_at, half_life)
+
+    def _bump(self, entry, quantity: int, at: float, half_life: float):
+        if entry is None:
+            return (float(quantity), at)
+        value, updated_at = entry
+        if at >= updated_at:
+            return (self._decay(value, at - updated_at, half_life) + quantity, at)
+        return (value + self._decay(quantity, updated_at - at, half_life), updated_at)
+
+    def add(self, item_id: str, quantity: int, at: float | None = None):
+        at = time.time() if at is None else at
+        hour = int(at // 3600) % 24
+        day = int(at // SECONDS_PER_DAY)
+        with self._lock:
+            self._events += 1
+            self._decayed[item_id] = self._bump(self._decayed.get(item_id), quantity, at, self.half_life_seconds)
+            slots = self._hourly.setdefault(item_id, [None] * 24)
+            slots[hour] = self._bump(slots[hour], quantity, at, self.hourly_half_life_seconds)
+            self._add_to_day(day, item_id, quantity)
+            if self._events % 1000 == 0:
+                self._prune(at)
+
+    def _add_to_day(self, day: int, item_id: str, quantity: int):
+        if not self._days or self._days[-1][0] < day:
+            self._days.append((day, {}))
+        for slot_day, counts in reversed(self._days):
+            if slot_day == day:
+                counts[item_id] = counts.get(item_id, 0) + quantity
+                return
+            if slot_day < day:
+                return
+
+    def _prune(self, now: float):
+        for item_id, entry in list(self._decayed.items()):
+            if self._value_at(entry, now, self.half_life_seconds) >= self.prune_below:
+                continue
+            slots = self._hourly.get(item_id, ())
+            if any(slot and self._value_at(slot, now, self.hourly_half_life_seconds) >= self.prune_below for slot in slots):
+                continue
+            del self._decayed[item_id]
+            self._hourly.pop(item_id, None)
+
+    def scores(self, now: float | None = None):
+        now = time.time() if now is None else now
+        hour = int(now // 3600) % 24
+        with self._lock:
+            result = {}
+            for item_id, entry in self._decayed.items():
+                slot = self._hourly[item_id][hour]
+                hourly = self._value_at(slot, now, self.hourly_half_life_seconds) if slot else 0.0
+                decayed = self._value_at(entry, now, self.half_life_seconds)
+                result[item_id] = (1 - self.hourly_weight) * decayed + self.hourly_weight * hourly
+            return result
+
+    def trending(self, limit: int = 10, now: float | None = None):
+        now = time.time() if now is None else now
+        hour = int(now // 3600) % 24
+        today = int(now // SECONDS_PER_DAY)
+        with self._lock:
+            window = {}
+            today_counts = {}
+            for day, counts in self._days:
+                if day <= today - self.window_days:
+                    continue
+                for item_id, quantity in counts.items():
+                    window[item_id] = window.get(item_id, 0) + quantity
+                if day == today:
+                    today_counts = counts
+            rows = []
+            for item_id, entry in self._decayed.items():
+                slot = self._hourly[item_id][hour]
+                rows.append(
+                    {
+                        "item_id": item_id,
+                        "score": self._value_at(entry, now, self.half_life_seconds),
+                        "this_hour_score": self._value_at(slot, now, self.hourly_half_life_seconds) if slot else 0.0,
+                        "today": today_counts.get(item_id, 0),
+                        "window": window.get(item_id, 0),
+                    }
+                )
+        rows.sort(key=lambda row: (-row["score"], row["item_id"]))
+        return rows[:limit]
+
+    def stats(self):
+        with self._lock:
+            return {
+                "items": len(self._decayed),
+                "events": self._events,
+                "window_days": self.window_days,
+                "half_life_hours": self.half_life_seconds / 3600,
+                "hourly_weight": self.hourly_weight,
+            }
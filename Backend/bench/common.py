@@ -0,0 +1,59 @@
+import asyncio
+import contextlib
+import json
+import os
+import subprocess
+import sys
+import tempfile
+from pathlib import Path
+
+import httpx
+
+
+BACKEND = Path(__file__).resolve().parents[1]
+
+
+def run_isolated(script: str, env: dict, *args):
+    result = subprocess.run(
+        [sys.executable, script, "--child", *args],
+        env={**os.environ, **env},
+        capture_output=True,
+        text=True,
+        check=True,
+    )
+    return json.loads(result.stdout.strip().splitlines()[-1])
+
+
+@contextlib.asynccontextmanager
+async def serve():
+    os.chdir(tempfile.mkdtemp(prefix="smart-restro-bench-"))
+    sys.path.insert(0, str(BACKEND))
+    import app.main as main
+
+    main.start_discovery_responder = lambda *args, **kwargs: None
+    main._startup()
+    try:
+        transport = httpx.ASGITransport(app=main.app)
+        async with httpx.AsyncClient(transport=transport, base_url="http://bench") as client:
+            yield main, client
+    finally:
+        main._shutdown()
+
+
+async def login(client, device_id: str, user_id: str = "demo", password: str = "demo123"):
+    response = await client.post(
+        "/api/login",
+        json={"device_id": device_id, "user_id": user_id, "password": password, "table_id": "T1"},
+    )
+    response.raise_for_status()
+    return {"X-Token": response.json()["token"]}
+
+
+def gather_limited(limit: int, jobs):
+    gate = asyncio.Semaphore(limit)
+
+    async def run(job):
+        async with gate:
+            return await job
+
+    return asyncio.gather(*(run(job) for job in jobs))
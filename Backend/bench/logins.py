@@ -0,0 +1,54 @@
+import argparse
+import asyncio
+import json
+import os
+import time
+
+from common import gather_limited, run_isolated, serve
+
+
+async def measure(logins: int, clients: int):
+    async with serve() as (main, client):
+        body = {"user_id": "demo", "password": "demo123", "table_id": "T1"}
+        started = time.perf_counter()
+        responses = await gather_limited(
+            clients,
+            (client.post("/api/login", json={**body, "device_id": f"bench-{index}"}) for index in range(logins)),
+        )
+        elapsed = time.perf_counter() - started
+        hashing = main._hasher.stats()
+    return {
+        "ok": sum(1 for response in responses if response.status_code == 200),
+        "logins_per_sec": logins / elapsed,
+        "rejected": hashing["rejected"],
+        "hash_ms_avg": hashing["hash_ms_avg"],
+        "queue_wait_ms_avg": hashing["queue_wait_ms_avg"],
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Login throughput through the password hashing pool")
+    parser.add_argument("--logins", type=int, default=200)
+    parser.add_argument("--clients", type=int, default=16)
+    parser.add_argument("--workers", type=int, nargs="+", default=[1, 2, os.cpu_count() or 4], help="SMART_RESTRO_KDF_WORKERS values")
+    parser.add_argument("--child", action="store_true", help=argparse.SUPPRESS)
+    args = parser.parse_args()
+    if args.child:
+        print(json.dumps(asyncio.run(measure(args.logins, args.clients))))
+        return
+    print(f"{args.logins} logins, {args.clients} concurrent clients")
+    print(f"{'workers':>7} {'ok':>5} {'logins/s':>9} {'rejected':>8} {'hash_ms':>8} {'wait_ms':>8}")
+    for workers in dict.fromkeys(args.workers):
+        result = run_isolated(
+            __file__,
+            {"SMART_RESTRO_KDF_WORKERS": str(workers)},
+            "--logins", str(args.logins), "--clients", str(args.clients),
+        )
+        print(
+            f"{workers:>7} {result['ok']:>5} {result['logins_per_sec']:>9.1f} {result['rejected']:>8} "
+            f"{result['hash_ms_avg']:>8.1f} {result['queue_wait_ms_avg']:>8.1f}"
+        )
+
+
+if __name__ == "__main__":
+    main()
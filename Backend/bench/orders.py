@@ -0,0 +1,56 @@
+import argparse
+import asyncio
+import json
+import time
+
+from common import gather_limited, login, run_isolated, serve
+
+
+async def measure(orders: int, clients: int, max_batch: int):
+    async with serve() as (main, client):
+        main._order_batcher.max_batch = max_batch
+        headers = await login(client, "bench")
+        menu = (await client.get("/api/menu", headers=headers)).json()["items"]
+        body = {"table_id": "T1", "items": [{"item_id": menu[0]["id"], "quantity": 1}]}
+        started = time.perf_counter()
+        responses = await gather_limited(
+            clients, (client.post("/api/orders", json=body, headers=headers) for _ in range(orders))
+        )
+        elapsed = time.perf_counter() - started
+        ingest = main._order_batcher.stats()
+    return {
+        "ok": sum(1 for response in responses if response.status_code == 200),
+        "orders_per_sec": orders / elapsed,
+        "batch_size_avg": ingest["batch_size_avg"],
+        "queue_wait_ms_avg": ingest["queue_wait_ms_avg"],
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Order ingest throughput, batched vs unbatched")
+    parser.add_argument("--orders", type=int, default=2000)
+    parser.add_argument("--clients", type=int, default=64)
+    parser.add_argument("--windows", type=float, nargs="+", default=[5, 0], help="SMART_RESTRO_ORDER_BATCH_MS values")
+    parser.add_argument("--max-batch", type=int, default=64)
+    parser.add_argument("--child", action="store_true", help=argparse.SUPPRESS)
+    args = parser.parse_args()
+    if args.child:
+        print(json.dumps(asyncio.run(measure(args.orders, args.clients, args.max_batch))))
+        return
+    print(f"{args.orders} orders, {args.clients} concurrent clients")
+    print(f"{'batch_ms':>8} {'max':>4} {'ok':>6} {'orders/s':>10} {'batch_avg':>10} {'wait_ms':>8}")
+    runs = [(window, args.max_batch) for window in args.windows] + [(0, 1)]
+    for window, max_batch in runs:
+        result = run_isolated(
+            __file__,
+            {"SMART_RESTRO_ORDER_BATCH_MS": str(window)},
+            "--orders", str(args.orders), "--clients", str(args.clients), "--max-batch", str(max_batch),
+        )
+        print(
+            f"{window:>8g} {max_batch:>4} {result['ok']:>6} {result['orders_per_sec']:>10.0f} "
+            f"{result['batch_size_avg']:>10.1f} {result['queue_wait_ms_avg']:>8.2f}"
+        )
+
+
+if __name__ == "__main__":
+    main()
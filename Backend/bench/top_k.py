@@ -0,0 +1,77 @@
+import argparse
+import random
+import sys
+import timeit
+
+from common import BACKEND
+
+sys.path.insert(0, str(BACKEND))
+
+from app.recommender import ScoringEngine  # noqa: E402
+
+
+CATEGORIES = ["pizza", "burger", "pasta", "salad", "dessert", "drinks", "indian", "chinese"]
+TAGS = ["vegetarian", "breakfast", "lunch", "dinner", "spicy"]
+
+
+def synthetic_items(count: int, rng: random.Random):
+    return [
+        {
+            "id": f"item-{index}",
+            "name": f"Item {index}",
+            "price": rng.randint(50, 900),
+            "category": rng.choice(CATEGORIES),
+            "tags": rng.sample(TAGS, rng.randint(0, 3)),
+        }
+        for index in range(count)
+    ]
+
+
+def sorted_top_k(engine, k, user_item_counts, top_category, favorite, veg_only, hour):
+    scores = engine.scores(user_item_counts, top_category, favorite, hour)
+    candidates = [
+        position for position, item in enumerate(engine.items)
+        if not veg_only or "vegetarian" in item["tags"]
+    ]
+    candidates.sort(key=lambda position: (-scores[position], position))
+    return [engine.items[position] for position in candidates[:k]]
+
+
+def main():
+    parser = argparse.ArgumentParser(description="ScoringEngine.top_k latency by menu size")
+    parser.add_argument("--sizes", type=int, nargs="+", default=[400, 5000, 50000])
+    parser.add_argument("--k", type=int, default=10)
+    parser.add_argument("--seed", type=int, default=7)
+    args = parser.parse_args()
+    rng = random.Random(args.seed)
+    print(f"k={args.k}")
+    print(f"{'items':>7} {'build_ms':>9} {'top_k_us':>9} {'veg_us':>9} {'sort_us':>9}")
+    for size in args.sizes:
+        items = synthetic_items(size, rng)
+        ids = [item["id"] for item in items]
+        popularity = {item_id: rng.randint(0, 500) for item_id in ids}
+        rating_sums = {item_id: rng.randint(0, 50) for item_id in ids}
+        rating_counts = {item_id: rng.randint(1, 10) for item_id in ids}
+        history = {item_id: rng.randint(1, 5) for item_id in rng.sample(ids, min(size, 20))}
+        query = (args.k, history, "pizza", "dessert", False, 19)
+        veg_query = (args.k, history, "pizza", "dessert", True, 19)
+
+        def build():
+            engine = ScoringEngine(1, items)
+            engine.load_aggregates(popularity, rating_sums, rating_counts)
+            return engine
+
+        engine = build()
+        assert engine.top_k(*query) == sorted_top_k(engine, *query)
+        assert engine.top_k(*veg_query) == sorted_top_k(engine, *veg_query)
+        runs = max(5, 200000 // size)
+        build_ms = min(timeit.repeat(build, number=1, repeat=3)) * 1000
+        top_k_us = min(timeit.repeat(lambda: engine.top_k(*query), number=runs, repeat=3)) / runs * 1e6
+        veg_us = min(timeit.repeat(lambda: engine.top_k(*veg_query), number=runs, repeat=3)) / runs * 1e6
+        sort_runs = max(1, runs // 10)
+        sort_us = min(timeit.repeat(lambda: sorted_top_k(engine, *query), number=sort_runs, repeat=3)) / sort_runs * 1e6
+        print(f"{size:>7} {build_ms:>9.1f} {top_k_us:>9.1f} {veg_us:>9.1f} {sort_us:>9.1f}")
+
+
+if __name__ == "__main__":
+    main()
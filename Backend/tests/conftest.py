@@ -0,0 +1,40 @@
+import importlib
+import sys
+
+import pytest
+from fastapi.testclient import TestClient
+
+
+def pytest_configure(config):
+    config.addinivalue_line("markers", "env(**values): environment variables set before app.main is imported")
+
+
+@pytest.fixture
+def server(request, tmp_path, monkeypatch):
+    monkeypatch.chdir(tmp_path)
+    marker = request.node.get_closest_marker("env")
+    for name, value in (marker.kwargs if marker else {}).items():
+        monkeypatch.setenv(name, value)
+    sys.modules.pop("app.main", None)
+    main = importlib.import_module("app.main")
+    monkeypatch.setattr(main, "start_discovery_responder", lambda *args, **kwargs: None)
+    return main
+
+
+@pytest.fixture
+def client(server):
+    with TestClient(server.app) as client:
+        yield client
+
+
+@pytest.fixture
+def login(client):
+    def login(user_id="demo", password="demo123", device_id="test", table_id="T1"):
+        response = client.post(
+            "/api/login",
+            json={"device_id": device_id, "user_id": user_id, "password": password, "table_id": table_id},
+        )
+        assert response.status_code == 200, response.text
+        return {"X-Token": response.json()["token"]}
+
+    return login
@@ -0,0 +1,55 @@
+from app.cooccurrence import CooccurrenceModel
+
+
+def test_add_order_counts_late_rowids_once():
+    model = CooccurrenceModel()
+    model.rebuild(lambda: [(1, "pizza"), (1, "cola")])
+    model.add_order(3, ["pizza", "fries"])
+    model.add_order(2, ["pizza", "salad"])
+    model.add_order(3, ["pizza", "fries"])
+    model.add_order(1, ["pizza", "cola"])
+    assert model.related("pizza") == [("cola", 1), ("fries", 1), ("salad", 1)]
+    assert model.stats()["orders_seen"] == 3
+
+
+def test_rebuild_replays_orders_added_while_loading():
+    model = CooccurrenceModel()
+
+    def load_rows():
+        model.add_order(3, ["pasta", "wine"])
+        model.add_order(2, ["pasta", "bread"])
+        return [(1, "pasta"), (1, "salad"), (2, "pasta"), (2, "bread")]
+
+    model.rebuild(load_rows)
+    model.add_order(3, ["pasta", "wine"])
+    model.add_order(4, ["pasta", "wine"])
+    assert model.related("pasta") == [("wine", 2), ("bread", 1), ("salad", 1)]
+    assert model.stats()["orders_seen"] == 4
+
+
+def test_boosts_are_normalized_per_seed_and_capped():
+    model = CooccurrenceModel()
+    model.rebuild(lambda: [(1, "pizza"), (1, "cola"), (2, "pizza"), (2, "cola"), (3, "pizza"), (3, "fries")])
+    light = model.boosts({"pizza": 1}, weight=4.0)
+    heavy = model.boosts({"pizza": 500}, weight=4.0)
+    assert light == heavy == {"cola": 4.0, "fries": 2.0}
+    assert model.boosts({"pizza": 1, "cola": 1}, weight=4.0)["pizza"] == 2.0
+    assert model.boosts({}) == {}
+
+
+def test_customer_without_history_gets_boosts(client, server, login):
+    first, second = (item["id"] for item in server.MENU_ITEMS[:2])
+    basket = {"table_id": "T1", "items": [{"item_id": first, "quantity": 1}, {"item_id": second, "quantity": 1}]}
+    headers = login()
+    for _ in range(3):
+        assert client.post("/api/orders", json=basket, headers=headers).status_code == 200
+    assert client.post("/api/register", json={"user_id": "newbie", "password": "newbie123"}).status_code == 200
+    newbie = login("newbie", "newbie123", "newbie")
+    seeds = server._cooccurrence_seeds({}, ())
+    assert set(seeds) == {first, second}
+    boosts = server._cooccurrence.boosts(seeds, weight=server.COOCCURRENCE_BOOST_WEIGHT)
+    assert boosts and max(boosts.values()) <= server.COOCCURRENCE_BOOST_WEIGHT
+    assert server._cooccurrence.boosts(server._cooccurrence_seeds({}, (first,))) == {second: 1.0}
+    response = client.get(f"/api/recommendations?cart={first}", headers=newbie)
+    assert response.status_code == 200
+    assert response.json()["items"]
@@ -0,0 +1,53 @@
+import asyncio
+
+import httpx
+
+
+CLIENTS = 20
+ORDERS_PER_CLIENT = 10
+TICK_SECONDS = 0.005
+MAX_LAG_SECONDS = 0.1
+
+
+async def _order_burst(server):
+    server._startup()
+    try:
+        transport = httpx.ASGITransport(app=server.app)
+        async with httpx.AsyncClient(transport=transport, base_url="http://test") as client:
+            login = {"user_id": "demo", "password": "demo123", "table_id": "T1"}
+            token = (await client.post("/api/login", json={**login, "device_id": "lag"})).json()["token"]
+            menu = (await client.get("/api/menu", headers={"X-Token": token})).json()["items"]
+            body = {"table_id": "T1", "items": [{"item_id": menu[0]["id"], "quantity": 1}]}
+            loop = asyncio.get_running_loop()
+            stop = asyncio.Event()
+            worst = 0.0
+
+            async def ticker():
+                nonlocal worst
+                while not stop.is_set():
+                    started = loop.time()
+                    await asyncio.sleep(TICK_SECONDS)
+                    worst = max(worst, loop.time() - started - TICK_SECONDS)
+
+            async def tablet(device_id):
+                session = await client.post("/api/login", json={**login, "device_id": device_id})
+                headers = {"X-Token": session.json()["token"]}
+                return [
+                    await client.post("/api/orders", json=body, headers=headers)
+                    for _ in range(ORDERS_PER_CLIENT)
+                ]
+
+            task = loop.create_task(ticker())
+            tablets = await asyncio.gather(*(tablet(f"lag-{index}") for index in range(CLIENTS)))
+            stop.set()
+            await task
+    finally:
+        server._shutdown()
+    return [response for responses in tablets for response in responses], worst
+
+
+def test_order_burst_does_not_stall_event_loop(server):
+    responses, worst = asyncio.run(_order_burst(server))
+    assert [response.status_code for response in responses] == [200] * CLIENTS * ORDERS_PER_CLIENT
+    assert len({response.json()["order_id"] for response in responses}) == CLIENTS * ORDERS_PER_CLIENT
+    assert worst < MAX_LAG_SECONDS, f"event loop stalled for {worst * 1000:.1f} ms"
@@ -0,0 +1,20 @@
+import json
+
+
+def test_order_items_migration_only_clears_copied_orders(client, server):
+    line = {"item_id": "IT_1", "name": "Tea", "category": "Drinks", "quantity": 2, "price": 10, "assigned_to": None}
+    with server._pool.writer() as conn:
+        for order_id in ("ord-legacy", "ord-partial"):
+            conn.execute(
+                "INSERT INTO orders (order_id, user_id, table_id, status, items_json, created_at, total, payment_status) "
+                "VALUES (?, 'demo', 'T1', 'placed', ?, '2024-01-01T00:00:00Z', 20, 'unpaid')",
+                (order_id, json.dumps([line])),
+            )
+        server._insert_order_items(conn, [("ord-partial", 0, "IT_1", "Tea", "drinks", 2, 10, None, "placed")])
+    with server._pool.writer() as conn:
+        server._migrate_order_items(conn)
+    with server._pool.reader() as conn:
+        items_json = dict(conn.execute("SELECT order_id, items_json FROM orders").fetchall())
+        lines = conn.execute("SELECT order_id, quantity FROM order_items ORDER BY order_id").fetchall()
+    assert items_json == {"ord-legacy": "[]", "ord-partial": json.dumps([line])}
+    assert [tuple(row) for row in lines] == [("ord-legacy", 2), ("ord-partial", 2)]
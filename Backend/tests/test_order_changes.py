@@ -0,0 +1,38 @@
+def _place_orders(client, server, headers, count):
+    order = {"table_id": "T1", "items": [{"item_id": server.MENU_ITEMS[0]["id"], "quantity": 1}]}
+    return [client.post("/api/orders", json=order, headers=headers).json()["order_id"] for _ in range(count)]
+
+
+def _changes(client, headers, **params):
+    response = client.get("/api/orders/changes", params=params, headers=headers)
+    assert response.status_code == 200, response.text
+    return response.json()
+
+
+def test_changes_feed_orders_by_change_seq(client, server, login):
+    first, second, third = _place_orders(client, server, login(), 3)
+    admin = login("admin", "admin123", "admin")
+    page = _changes(client, admin, limit=2)
+    assert [order["order_id"] for order in page["orders"]] == [first, second]
+    assert page["has_more"] is True
+    rest = _changes(client, admin, since=page["since"])
+    assert [order["order_id"] for order in rest["orders"]] == [third]
+    assert rest["has_more"] is False
+    seqs = [order["change_seq"] for order in page["orders"] + rest["orders"]]
+    assert seqs == sorted(seqs) and len(set(seqs)) == 3
+    assert client.put(f"/api/orders/{first}", json={"status": "preparing"}, headers=admin).status_code == 200
+    update = _changes(client, admin, since=rest["since"])
+    assert [(order["order_id"], order["status"]) for order in update["orders"]] == [(first, "preparing")]
+    assert update["orders"][0]["change_seq"] > seqs[-1]
+    assert _changes(client, admin, since=update["since"]) == {"orders": [], "since": update["since"], "has_more": False}
+    assert client.get("/api/orders", headers=admin).json()["change_seq"] == update["since"]
+
+
+def test_changes_feed_is_scoped_for_chefs(client, server, login):
+    mine, other = _place_orders(client, server, login(), 2)
+    admin = login("admin", "admin123", "admin")
+    update = {"status": "preparing", "assigned_to": "chef1"}
+    assert client.put(f"/api/orders/{mine}", json=update, headers=admin).status_code == 200
+    chef = login("chef1", "chef123", "chef")
+    assert [order["order_id"] for order in _changes(client, chef)["orders"]] == [mine]
+    assert client.get("/api/orders/changes", headers=login()).status_code == 403
@@ -0,0 +1,40 @@
+def _place_orders(client, server, headers, count):
+    order = {"table_id": "T1", "items": [{"item_id": server.MENU_ITEMS[0]["id"], "quantity": 1}]}
+    return [client.post("/api/orders", json=order, headers=headers).json()["order_id"] for _ in range(count)]
+
+
+def _page(client, headers, **params):
+    response = client.get("/api/orders", params=params, headers=headers)
+    assert response.status_code == 200, response.text
+    return response.json()
+
+
+def test_keyset_pages_walk_every_order_once(client, server, login):
+    placed = _place_orders(client, server, login(), 7)
+    admin = login("admin", "admin123", "admin")
+    page = _page(client, admin, limit=3)
+    pages = [page]
+    while page["next_cursor"]:
+        page = _page(client, admin, limit=3, before=page["next_cursor"])
+        pages.append(page)
+    seen = [order["order_id"] for page in pages for order in page["orders"]]
+    assert [len(page["orders"]) for page in pages] == [3, 3, 1]
+    assert seen == placed[::-1]
+    newest = _page(client, admin, limit=3)
+    older = _page(client, admin, limit=3, before=newest["next_cursor"])
+    back = _page(client, admin, limit=3, after=older["prev_cursor"])
+    assert [order["order_id"] for order in back["orders"]] == [order["order_id"] for order in newest["orders"]]
+
+
+def test_order_page_filters(client, server, login):
+    placed = _place_orders(client, server, login(), 2)
+    admin = login("admin", "admin123", "admin")
+    assert client.put(f"/api/orders/{placed[0]}", json={"status": "served"}, headers=admin).status_code == 200
+    assert [order["order_id"] for order in _page(client, admin, status="open")["orders"]] == [placed[1]]
+    assert _page(client, admin, table_id="T9")["orders"] == []
+
+
+def test_bad_cursors_are_rejected(client, login):
+    admin = login("admin", "admin123", "admin")
+    for params in ({"before": "not-a-cursor"}, {"after": "%%%"}, {"before": "YQ==", "after": "YQ=="}):
+        assert client.get("/api/orders", params=params, headers=admin).status_code == 400
@@ -0,0 +1,18 @@
+def _aggregate_rows(server, user_id):
+    with server._pool.reader() as conn:
+        return [
+            conn.execute(f"SELECT COUNT(*) FROM {table} WHERE user_id = ?", (user_id,)).fetchone()[0]
+            for table in ("user_item_counts", "user_category_counts")
+        ]
+
+
+def test_delete_profile_drops_recommendation_aggregates(client, server, login):
+    headers = login()
+    item_id = server.MENU_ITEMS[0]["id"]
+    order = {"table_id": "T1", "items": [{"item_id": item_id, "quantity": 2}]}
+    assert client.post("/api/orders", json=order, headers=headers).status_code == 200
+    assert _aggregate_rows(server, "demo") == [1, 1]
+    assert client.delete("/api/profile", headers=headers).status_code == 200
+    assert _aggregate_rows(server, "demo") == [0, 0]
+    assert client.post("/api/register", json={"user_id": "demo", "password": "fresh123"}).status_code == 200
+    assert _aggregate_rows(server, "demo") == [0, 0]
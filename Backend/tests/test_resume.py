@@ -0,0 +1,51 @@
+import time
+
+
+def _connect(client, headers, **params):
+    query = "&".join(f"{name}={value}" for name, value in {"token": headers["X-Token"], "topics": "admin", **params}.items())
+    return client.websocket_connect(f"/ws/orders?{query}")
+
+
+def _place_orders(client, server, headers, count):
+    order = {"table_id": "T1", "items": [{"item_id": server.MENU_ITEMS[0]["id"], "quantity": 1}]}
+    return [client.post("/api/orders", json=order, headers=headers).json()["order_id"] for _ in range(count)]
+
+
+def _wait_for_seq(server, seq):
+    deadline = time.monotonic() + 5
+    while server._broadcaster._seq < seq and time.monotonic() < deadline:
+        time.sleep(0.01)
+
+
+def test_reconnect_replays_missed_events(client, server, login):
+    admin = login("admin", "admin123", "admin")
+    with _connect(client, admin) as ws:
+        subscribed = ws.receive_json()
+    epoch, seq = subscribed["epoch"], subscribed["seq"]
+    order_ids = _place_orders(client, server, login(), 3)
+    _wait_for_seq(server, seq + 3)
+    with _connect(client, admin, last_seq=seq, epoch=epoch) as ws:
+        resumed = ws.receive_json()
+        replayed = [ws.receive_json() for _ in order_ids]
+    assert resumed["resumed"] is True
+    assert resumed["seq"] == seq
+    assert [event["seq"] for event in replayed] == [seq + 1, seq + 2, seq + 3]
+    assert [event["prev"] for event in replayed] == [seq, seq + 1, seq + 2]
+    assert [event["order_id"] for event in replayed] == order_ids
+
+
+def test_bad_epoch_or_future_seq_forces_resync(client, server, login):
+    admin = login("admin", "admin123", "admin")
+    with _connect(client, admin) as ws:
+        subscribed = ws.receive_json()
+    _place_orders(client, server, login(), 1)
+    _wait_for_seq(server, subscribed["seq"] + 1)
+    for params in (
+        {"last_seq": subscribed["seq"], "epoch": "stale-epoch"},
+        {"last_seq": subscribed["seq"] + 100, "epoch": subscribed["epoch"]},
+    ):
+        with _connect(client, admin, **params) as ws:
+            reply = ws.receive_json()
+        assert reply["type"] == "subscribed"
+        assert reply["resumed"] is False
+        assert reply["seq"] == subscribed["seq"] + 1
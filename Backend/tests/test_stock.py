@@ -0,0 +1,47 @@
+import asyncio
+
+import httpx
+import pytest
+
+
+pytestmark = pytest.mark.env(SMART_RESTRO_STRICT_STOCK="1")
+
+
+def _order(item_id, quantity):
+    return {"table_id": "T1", "items": [{"item_id": item_id, "quantity": quantity}]}
+
+
+def _stock(client, admin, item_id):
+    items = client.get("/api/inventory", headers=admin).json()["items"]
+    return next(item["stock"] for item in items if item["item_id"] == item_id)
+
+
+@pytest.mark.parametrize("quantity", [-5, 0])
+def test_non_positive_quantity_is_rejected(client, server, login, quantity):
+    admin = login("admin", "admin123", "admin")
+    item_id = server.MENU_ITEMS[0]["id"]
+    before = _stock(client, admin, item_id)
+    response = client.post("/api/orders", json=_order(item_id, quantity), headers=login())
+    assert response.status_code == 400
+    assert _stock(client, admin, item_id) == before
+    assert client.get("/api/orders", headers=admin).json()["orders"] == []
+
+
+def test_concurrent_orders_cannot_oversell(client, server, login):
+    admin = login("admin", "admin123", "admin")
+    item_id = server.MENU_ITEMS[0]["id"]
+    assert client.put(f"/api/inventory/{item_id}", json={"stock": 3}, headers=admin).status_code == 200
+    headers = login()
+
+    async def burst():
+        transport = httpx.ASGITransport(app=server.app)
+        async with httpx.AsyncClient(transport=transport, base_url="http://test") as concurrent:
+            return await asyncio.gather(
+                *(concurrent.post("/api/orders", json=_order(item_id, 1), headers=headers) for _ in range(5))
+            )
+
+    responses = client.portal.call(burst)
+    assert sorted(response.status_code for response in responses) == [200, 200, 200, 409, 409]
+    assert _stock(client, admin, item_id) == 0
+    rejected = next(response for response in responses if response.status_code == 409)
+    assert item_id in rejected.json()["detail"]
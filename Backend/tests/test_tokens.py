@@ -0,0 +1,62 @@
+import pytest
+
+from app.tokens import TOKEN_PREFIX, TokenSigner
+
+
+def _tamper(token):
+    body, signature = token[len(TOKEN_PREFIX):].split(".")
+    flipped = "A" if body[5] != "A" else "B"
+    return f"{TOKEN_PREFIX}{body[:5]}{flipped}{body[6:]}.{signature}"
+
+
+def test_signer_round_trip_and_rotation():
+    old = TokenSigner({"k1": b"first"})
+    token, claims = old.issue("demo", "customer", None, 60)
+    assert old.verify(token) == claims
+    rotated = TokenSigner({"k2": b"second", "k1": b"first"})
+    assert rotated.verify(token) == claims
+    assert rotated.issue("demo", "customer", None, 60)[1]["kid"] == "k2"
+    assert TokenSigner({"k2": b"second"}).verify(token) is None
+
+
+def test_signer_rejects_tampered_tokens():
+    signer = TokenSigner({"k1": b"first"})
+    token, _ = signer.issue("demo", "customer", None, 60)
+    assert signer.verify(_tamper(token)) is None
+    assert signer.verify(token[:-2] + ("AA" if token[-2:] != "AA" else "BB")) is None
+    assert signer.verify(token.replace(TOKEN_PREFIX, "st0.", 1)) is None
+    assert signer.verify(TOKEN_PREFIX + "garbage") is None
+
+
+def test_signer_without_keys_refuses_to_issue():
+    with pytest.raises(RuntimeError):
+        TokenSigner({}).issue("demo", "customer", None, 60)
+
+
+signed = pytest.mark.env(SMART_RESTRO_SIGNED_TOKENS="1", SMART_RESTRO_TOKEN_KEYS="k1:secret")
+
+
+@signed
+def test_signed_session_verify_tamper_and_logout(client, login):
+    headers = login()
+    assert headers["X-Token"].startswith(TOKEN_PREFIX)
+    assert client.get("/api/orders/mine", headers=headers).status_code == 200
+    assert client.get("/api/orders/mine", headers={"X-Token": _tamper(headers["X-Token"])}).status_code == 401
+    other = login(device_id="other")
+    assert client.post("/api/logout", headers=headers).status_code == 200
+    assert client.get("/api/orders/mine", headers=headers).status_code == 401
+    assert client.get("/api/orders/mine", headers=other).status_code == 200
+
+
+@signed
+def test_expired_signed_token_is_rejected(client, server, login, monkeypatch):
+    monkeypatch.setattr(server, "TOKEN_TTL_SECONDS", -1)
+    assert client.get("/api/orders/mine", headers=login()).status_code == 401
+
+
+@pytest.mark.env(SMART_RESTRO_SIGNED_TOKENS="1")
+def test_generated_key_is_stored_and_reused(client, server, login):
+    headers = login()
+    with server._pool.reader() as conn:
+        secret = conn.execute("SELECT value FROM server_secrets WHERE name = 'token_key'").fetchone()[0]
+    assert TokenSigner({"db": secret.encode("utf-8")}).verify(headers["X-Token"]) is not None
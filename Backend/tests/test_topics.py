@@ -0,0 +1,46 @@
+def _subscribe(client, headers, topics):
+    token = headers["X-Token"]
+    with client.websocket_connect(f"/ws/orders?token={token}&topics={','.join(topics)}") as ws:
+        frames = [ws.receive_json()]
+        if frames[0]["type"] == "error":
+            frames.append(ws.receive_json())
+    return frames
+
+
+def _place_order(client, server, headers):
+    order = {"table_id": "T1", "items": [{"item_id": server.MENU_ITEMS[0]["id"], "quantity": 1}]}
+    return client.post("/api/orders", json=order, headers=headers).json()["order_id"]
+
+
+def test_chef_topics_are_limited_to_own_queue(client, server, login):
+    customer = login()
+    assigned = _place_order(client, server, customer)
+    other = _place_order(client, server, customer)
+    admin = login("admin", "admin123", "admin")
+    update = {"status": "preparing", "assigned_to": "chef1"}
+    assert client.put(f"/api/orders/{assigned}", json=update, headers=admin).status_code == 200
+    chef = login("chef1", "chef123", "chef")
+    topics = [
+        "chef:pizza", "chef:dessert", "chef:*", "assignee:chef1", "assignee:admin",
+        f"order:{assigned}", f"order:{other}", "table:T1", "admin",
+    ]
+    (subscribed,) = _subscribe(client, chef, topics)
+    assert subscribed["type"] == "subscribed"
+    assert subscribed["topics"] == sorted(["chef:pizza", "assignee:chef1", f"order:{assigned}"])
+    assert sorted(subscribed["rejected"]) == sorted(
+        ["chef:dessert", "chef:*", "assignee:admin", f"order:{other}", "table:T1", "admin"]
+    )
+
+
+def test_unknown_topic_kinds_get_an_error_frame(client, login):
+    for headers in (login("admin", "admin123", "admin"), login("chef1", "chef123", "chef"), login()):
+        error, subscribed = _subscribe(client, headers, ["bogus:1", "order:", "everything"])
+        assert error == {"type": "error", "detail": "Unknown topics: bogus:1, order:, everything"}
+        assert subscribed["topics"] == []
+        assert sorted(subscribed["rejected"]) == ["bogus:1", "everything", "order:"]
+
+
+def test_admin_may_subscribe_to_any_known_topic(client, login):
+    (subscribed,) = _subscribe(client, login("admin", "admin123", "admin"), ["admin", "table:T4", "chef:pasta"])
+    assert subscribed["topics"] == ["admin", "chef:pasta", "table:T4"]
+    assert subscribed["rejected"] == []
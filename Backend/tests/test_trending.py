@@ -0,0 +1,27 @@
+import pytest
+
+from app.trending import PopularityTracker
+
+
+HOUR = 3600
+NOW = 1_700_000_000 - 1_700_000_000 % 86400 + 12 * HOUR
+
+
+def test_fresh_order_counts_once():
+    tracker = PopularityTracker()
+    tracker.add("tea", 1, NOW)
+    assert tracker.scores(NOW) == {"tea": pytest.approx(1.0)}
+
+
+def test_recent_demand_outranks_same_hour_habit():
+    tracker = PopularityTracker(hourly_weight=0.3)
+    tracker.add("coffee", 7, NOW - HOUR)
+    tracker.add("biryani", 5, NOW - 24 * HOUR)
+    scores = tracker.scores(NOW)
+    assert sorted(scores, key=scores.get, reverse=True) == ["coffee", "biryani"]
+    assert scores["biryani"] > 0.7 * 5 * 0.5 ** (1 / 3)
+
+
+def test_hourly_weight_must_be_a_fraction():
+    with pytest.raises(ValueError):
+        PopularityTracker(hourly_weight=1.5)
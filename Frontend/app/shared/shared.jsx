@@ -1,4 +1,4 @@
-const { useEffect, useMemo, useState } = React;
+const { useEffect, useMemo, useRef, useState } = React;
 
 const apiBase = (() => {
   const params = new URLSearchParams(window.location.search);
@@ -26,6 +26,70 @@ function useHashRoute(defaultRoute) {
   return route;
 }
 
+function mergeOrder(orders, order) {
+  const index = orders.findIndex((entry) => entry.order_id === order.order_id);
+  if (index === -1) return [order, ...orders];
+  const next = orders.slice();
+  next[index] = order;
+  return next;
+}
+
+function useOrderFeed(token, topics, onResync, onOrder) {
+  const topicsRef = useRef([]);
+  useEffect(() => {
+    if (!token) return;
+    let lastSeq = null;
+    let epoch = null;
+    let ws = null;
+    let retryTimer = null;
+    let retryDelay = 1000;
+    let stopped = false;
+    const connect = () => {
+      const params = new URLSearchParams({ token, topics });
+      if (epoch !== null && lastSeq !== null) {
+        params.set("epoch", epoch);
+        params.set("last_seq", lastSeq);
+      }
+      ws = new WebSocket(apiBase.replace("http", "ws") + `/ws/orders?${params}`);
+      ws.onmessage = (event) => {
+        const msg = JSON.parse(event.data);
+        if (msg.type === "ping") {
+          ws.send(JSON.stringify({ type: "pong" }));
+          return;
+        }
+        if (msg.type === "error") return;
+        if (msg.type === "subscribed") {
+          topicsRef.current = msg.topics;
+          epoch = msg.epoch;
+          lastSeq = msg.seq;
+          retryDelay = 1000;
+          if (!msg.resumed) onResync();
+          return;
+        }
+        if (msg.type === "resync" || (lastSeq !== null && msg.prev !== lastSeq)) {
+          lastSeq = msg.type === "resync" ? null : msg.seq;
+          onResync();
+          return;
+        }
+        lastSeq = msg.seq;
+        if (msg.order) onOrder(msg.order);
+      };
+      ws.onclose = () => {
+        if (stopped) return;
+        retryTimer = setTimeout(connect, retryDelay * (0.5 + Math.random()));
+        retryDelay = Math.min(retryDelay * 2, 30000);
+      };
+    };
+    connect();
+    return () => {
+      stopped = true;
+      clearTimeout(retryTimer);
+      ws.close();
+    };
+  }, [token, topics]);
+  return topicsRef;
+}
+
 async function fetchJson(url, options = {}) {
   const res = await fetch(url, options);
   const data = await res.json().catch(() => ({}));
@@ -36,6 +100,15 @@ async function fetchJson(url, options = {}) {
   return data;
 }
 
+async function fetchOrderChanges(headers, since, onOrder) {
+  let data = { since, has_more: true };
+  while (data.has_more) {
+    data = await fetchJson(`${apiBase}/api/orders/changes?since=${data.since}`, { headers });
+    data.orders.forEach(onOrder);
+  }
+  return data.since;
+}
+
 function Nav({ route }) {
   const go = (target) => {
     window.location.hash = `/${target}`;
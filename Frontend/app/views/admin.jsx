@@ -7,6 +7,7 @@ function AdminView() {
   const [status, setStatus] = useState("Not logged in");
   const [clients, setClients] = useState([]);
   const [orders, setOrders] = useState([]);
+  const [olderCursor, setOlderCursor] = useState(null);
   const [inventory, setInventory] = useState([]);
   const [billing, setBilling] = useState([]);
   const [billingTotal, setBillingTotal] = useState(0);
@@ -21,12 +22,20 @@ function AdminView() {
     localStorage.setItem("sr_token_admin", token);
   }, [token]);
 
-  useEffect(() => {
-    const wsUrl = apiBase.replace("http", "ws") + "/ws/orders";
-    const ws = new WebSocket(wsUrl);
-    ws.onmessage = () => refreshOrders();
-    return () => ws.close();
-  }, [token]);
+  const applyOrder = (order) => setOrders((prev) => mergeOrder(prev, order));
+
+  const changeSeqRef = useRef(null);
+
+  const catchUp = async () => {
+    if (changeSeqRef.current === null) return refreshOrders();
+    try {
+      changeSeqRef.current = await fetchOrderChanges(headers, changeSeqRef.current, applyOrder);
+    } catch (err) {
+      refreshOrders();
+    }
+  };
+
+  useOrderFeed(token, "admin", () => catchUp(), applyOrder);
 
   useEffect(() => {
     if (token) {
@@ -80,18 +89,31 @@ function AdminView() {
     try {
       const data = await fetchJson(`${apiBase}/api/orders`, { headers });
       setOrders(data.orders || []);
+      setOlderCursor(data.next_cursor);
+      changeSeqRef.current = data.change_seq;
+    } catch (err) {
+      setStatus(err.message);
+    }
+  };
+
+  const loadOlderOrders = async () => {
+    if (!token || !olderCursor) return;
+    try {
+      const data = await fetchJson(`${apiBase}/api/orders?before=${encodeURIComponent(olderCursor)}`, { headers });
+      setOrders((prev) => [...prev, ...(data.orders || [])]);
+      setOlderCursor(data.next_cursor);
     } catch (err) {
       setStatus(err.message);
     }
   };
 
   const updateOrder = async (orderId, statusValue, assignedTo) => {
-    await fetchJson(`${apiBase}/api/orders/${orderId}`, {
+    const data = await fetchJson(`${apiBase}/api/orders/${orderId}`, {
       method: "PUT",
       headers: { "Content-Type": "application/json", ...headers },
       body: JSON.stringify({ status: statusValue, assigned_to: assignedTo }),
     });
-    refreshOrders();
+    applyOrder(data.order);
   };
 
   const refreshInventory = async () => {
@@ -160,7 +182,7 @@ function AdminView() {
               <span className="status">Systems online</span>
             </div>
             <div className="stat-card">
-              <strong>{orders.length}</strong>
+              <strong>{orders.filter((order) => order.status !== "served").length}</strong>
               <span className="status">Active orders</span>
             </div>
             <div className="stat-card">
@@ -276,7 +298,10 @@ function AdminView() {
                 </div>
               </div>
             ))}
-          <button className="btn btn-secondary" onClick={refreshOrders}>Refresh</button>
+          <div className="row">
+            {olderCursor && <button className="btn btn-secondary" onClick={loadOlderOrders}>Load older</button>}
+            <button className="btn btn-secondary" onClick={refreshOrders}>Refresh</button>
+          </div>
         </div>
       )}
 
@@ -22,6 +22,7 @@ function CustomerView() {
   const [ambience, setAmbience] = useState("luxury");
 
   const headers = useMemo(() => (token ? { "X-Token": token } : {}), [token]);
+  const cartIds = Object.keys(cart).sort().join(",");
 
   useEffect(() => {
     localStorage.setItem("sr_token_customer", token);
@@ -37,17 +38,27 @@ function CustomerView() {
   useEffect(() => {
     if (!token) return;
     loadMenu();
-    loadRecommendations();
     loadHistory();
     loadPreferences();
   }, [token]);
 
   useEffect(() => {
-    const wsUrl = apiBase.replace("http", "ws") + "/ws/orders";
+    if (!token) return;
+    loadRecommendations();
+  }, [token, cartIds]);
+
+  useEffect(() => {
+    if (!token || !lastOrderId) return;
+    const topics = encodeURIComponent(`order:${lastOrderId}`);
+    const wsUrl = apiBase.replace("http", "ws") + `/ws/orders?token=${encodeURIComponent(token)}&topics=${topics}`;
     const ws = new WebSocket(wsUrl);
     ws.onmessage = (event) => {
       try {
         const msg = JSON.parse(event.data);
+        if (msg.type === "ping") {
+          ws.send(JSON.stringify({ type: "pong" }));
+          return;
+        }
         if (msg.type === "order_status" && msg.order_id === lastOrderId) {
           setOrderStatus(`Order ${msg.order_id}: ${msg.status}`);
         }
@@ -56,7 +67,7 @@ function CustomerView() {
       }
     };
     return () => ws.close();
-  }, [lastOrderId]);
+  }, [token, lastOrderId]);
 
   useEffect(() => {
     const timer = setInterval(() => {
@@ -134,7 +145,8 @@ function CustomerView() {
   const loadRecommendations = async () => {
     if (!token) return;
     try {
-      const data = await fetchJson(`${apiBase}/api/recommendations`, { headers });
+      const query = cartIds ? `?cart=${encodeURIComponent(cartIds)}` : "";
+      const data = await fetchJson(`${apiBase}/api/recommendations${query}`, { headers });
       setRecs(data.items || []);
     } catch (err) {
       setLoginStatus(err.message);
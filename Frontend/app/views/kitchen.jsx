@@ -16,12 +16,28 @@ function KitchenView() {
     localStorage.setItem("sr_token_chef", token);
   }, [token]);
 
-  useEffect(() => {
-    const wsUrl = apiBase.replace("http", "ws") + "/ws/orders";
-    const ws = new WebSocket(wsUrl);
-    ws.onmessage = () => refreshOrders();
-    return () => ws.close();
-  }, [token]);
+  const applyOrder = (order) => {
+    const topics = topicsRef.current;
+    const items = topics.includes("chef:*")
+      ? order.items
+      : order.items.filter((item) => topics.includes(`chef:${item.category}`) || topics.includes(`assignee:${item.assigned_to}`));
+    setOrders((prev) => (items.length && order.status !== "served"
+      ? mergeOrder(prev, { ...order, items })
+      : prev.filter((entry) => entry.order_id !== order.order_id)));
+  };
+
+  const changeSeqRef = useRef(null);
+
+  const catchUp = async () => {
+    if (changeSeqRef.current === null) return refreshOrders();
+    try {
+      changeSeqRef.current = await fetchOrderChanges(headers, changeSeqRef.current, applyOrder);
+    } catch (err) {
+      refreshOrders();
+    }
+  };
+
+  const topicsRef = useOrderFeed(token, "kitchen", () => catchUp(), applyOrder);
 
   useEffect(() => {
     if (token) {
@@ -54,8 +70,16 @@ function KitchenView() {
   const refreshOrders = async () => {
     if (!token) return;
     try {
-      const data = await fetchJson(`${apiBase}/api/orders`, { headers });
-      setOrders(data.orders || []);
+      const data = await fetchJson(`${apiBase}/api/orders?limit=200`, { headers });
+      let all = data.orders || [];
+      let cursor = data.next_cursor;
+      while (cursor) {
+        const page = await fetchJson(`${apiBase}/api/orders?limit=200&before=${encodeURIComponent(cursor)}`, { headers });
+        all = all.concat(page.orders || []);
+        cursor = page.next_cursor;
+      }
+      setOrders(all);
+      changeSeqRef.current = data.change_seq;
     } catch (err) {
       if (err.message.includes("token")) {
         setToken("");
@@ -67,12 +91,12 @@ function KitchenView() {
   };
 
   const updateOrder = async (orderId, statusValue) => {
-    await fetchJson(`${apiBase}/api/orders/${orderId}`, {
+    const data = await fetchJson(`${apiBase}/api/orders/${orderId}`, {
       method: "PUT",
       headers: { "Content-Type": "application/json", ...headers },
       body: JSON.stringify({ status: statusValue }),
     });
-    refreshOrders();
+    applyOrder(data.order);
   };
 
   return (